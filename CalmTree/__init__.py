@@ -29,40 +29,67 @@ bl_info = {
     "category": "Add Object",
 }
 
-import bpy
+try:
+    import bpy
+except ImportError:
+    # outside of Blender only the generation core (algorithm, helper) is importable
+    bpy = None
 
-from .calmtree import *
-from .propertygroup import *
-from .panel import *
-from .uvmaster import *
+if bpy is not None:
+    from .calmtree import *
+    from .propertygroup import *
+    from .panel import *
+    from .uvmaster import *
+    from .scheduler import updates
 
-classes = (
-CALMTREE_OT_new,
-CALMTREE_OT_update,
-CALMTREE_OT_sync,
-CALMTREE_OT_default,
-CALMTREE_PG_props,
-CALMTREE_PT_createmain,
-CALMTREE_PT_createadvanced,
-CALMTREE_PT_materialsmain,
-CALMTREE_PT_createedit,
-CALMTREE_OT_leaf,
-CALMTREE_OT_mat,
-CALMTREE_OT_draw,
-CALMTREE_OT_regrow,
-CALMTREE_OT_uv)
+    classes = (
+    CALMTREE_OT_new,
+    CALMTREE_OT_update,
+    CALMTREE_OT_update_modal,
+    CALMTREE_OT_update_worker,
+    CALMTREE_OT_sync,
+    CALMTREE_OT_default,
+    CALMTREE_PG_props,
+    CALMTREE_PT_createmain,
+    CALMTREE_PT_createadvanced,
+    CALMTREE_PT_createstats,
+    CALMTREE_PT_materialsmain,
+    CALMTREE_PT_createedit,
+    CALMTREE_OT_leaf,
+    CALMTREE_OT_mat,
+    CALMTREE_OT_draw,
+    CALMTREE_OT_regrow,
+    CALMTREE_OT_profile,
+    CALMTREE_OT_uv)
 
-def register():
-    for cls in classes:
-        bpy.utils.register_class(cls)
+    def register():
+        for cls in classes:
+            bpy.utils.register_class(cls)
 
-    bpy.types.WindowManager.calmtree_props = bpy.props.PointerProperty(type=propertygroup.CALMTREE_PG_props)
+        bpy.types.WindowManager.calmtree_props = bpy.props.PointerProperty(type=propertygroup.CALMTREE_PG_props)
+        bpy.types.WindowManager.calmtree_profile = bpy.props.BoolProperty(default=False)
+        bpy.types.WindowManager.calmtree_update_delay = bpy.props.FloatProperty(
+            name='Update delay',
+            description='Seconds without changes before the tree updates, 0 updates on every change',
+            default=0.25,
+            min=0,
+            max=5,
+        )
+        bpy.types.WindowManager.calmtree_preview = bpy.props.BoolProperty(
+            name='Preview while dragging',
+            description='Coarse updates while a slider is dragged, full quality once it stops',
+            default=True,
+        )
 
-def unregister():
-    del bpy.types.WindowManager.calmtree_props
+    def unregister():
+        updates.cancel()
+        del bpy.types.WindowManager.calmtree_props
+        del bpy.types.WindowManager.calmtree_profile
+        del bpy.types.WindowManager.calmtree_update_delay
+        del bpy.types.WindowManager.calmtree_preview
 
-    for cls in reversed(classes):
-        bpy.utils.unregister_class(cls)
+        for cls in reversed(classes):
+            bpy.utils.unregister_class(cls)
 
-if __name__ == "__main__":
+if __name__ == "__main__" and bpy is not None:
     register()
\ No newline at end of file
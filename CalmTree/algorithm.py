@@ -1,121 +1,204 @@
 import math
+import copy
+import json
 from math import floor, ceil
+from functools import lru_cache
 import random
-from mathutils import Vector, noise ,Matrix, Quaternion
-import bl_math
+import time
+import numpy as np
 from .helper import *
 
+# SPINES
+# all spine functions work on a batch of B branches at once, spines are padded (B, N, 3) arrays
+# and n holds the number of points of each branch, everything past it is ignored
+
+# noise used for bending, f(i, seed) and f(i, seed+10) for i in range(count) for every branch
+def bend_noise(seeds, count, l, bd_p):
+    b_a, b_s = bd_p[0], bd_p[3]
+    z = np.arange(count)*np.asarray(l, dtype=np.float64)[:, None]*b_s
+    seeds = np.asarray(seeds, dtype=np.float64)[:, None]
+    f_noise = lambda b_seed: b_a*noise(np.stack(np.broadcast_arrays(0.0, b_seed, z), axis=-1))
+    return np.stack((f_noise(seeds), f_noise(seeds+10)), axis=-1)
+
 # bends the spine in a more meaningful way
-def spine_bend(spine, n, bd_p, l, guide, mode):
-    b_a, b_up, b_c, b_s, b_w, b_seed = bd_p
-    f_noise = lambda i, b_seed: b_a*noise.noise((0, b_seed, i*l*b_s))
-    
-    old_vec = spine[-2] - spine[-3] #get previous vector
-    angle = (Vector((0,0,1)).angle(old_vec)) #calculate global angle
-    quat = Quaternion(Vector((old_vec[1], -old_vec[0],0)), b_up*angle/(n-len(spine)+1)) #ideal progression
-    new_vec = quat@old_vec
-    
-    bend_vec = Vector((f_noise(len(spine)-2, b_seed), f_noise(len(spine)-2, b_seed+10), 1)).normalized() #generate random vector        
-    bend_vec = (Vector((0,0,1)).rotation_difference(new_vec))@bend_vec #rotating bend_vec to local direction
-    x = bl_math.clamp(guide.angle(bend_vec,0.0)/math.radians(90))**2 #apply dampening, to be improved
-    new_vec = bend_vec*(1-x) + new_vec.normalized()*x #mixing between random (bend_vec) and ideal (new_vec) vectors
-
-    # transformation itself, rotating the remaining branch towards the new vector
-    quat = old_vec.rotation_difference(new_vec)
-    if mode == 'quat':
-        return quat
-    elif mode == 'spine':
-        spine[-1] = quat@(spine[-1]-spine[-2])+spine[-2]
-        return spine
+# returns the directions of the next segments, old_vec are the last segments and k the number of points including the new one
+def spine_bend(old_vec, k, n, bd_p, guide, bend):
+    b_up = bd_p[1]
+    angle = angle_from_z(old_vec) #calculate global angle
+    axis = np.stack((old_vec[:, 1], -old_vec[:, 0], np.zeros(len(old_vec))), axis=-1)
+    new_vec = np.einsum('bij,bj->bi', axis_angle(axis, b_up*angle/(n-k+1)), old_vec) #ideal progression
+
+    bend_vec = normalized(np.concatenate((bend, np.ones((len(bend), 1))), axis=-1)) #random vector from noise
+    bend_vec = np.einsum('bij,bj->bi', rotations_from_z(new_vec), bend_vec) #rotating bend_vec to local direction
+    x = np.clip(angle_between(guide, bend_vec)/math.radians(90), 0, 1)[:, None]**2 #apply dampening, to be improved
+    return bend_vec*(1-x) + normalized(new_vec)*x #mixing between random (bend_vec) and ideal (new_vec) vectors
+
+# grows spines from (0,0,0) along the guides, one segment step for all the branches at a time
+def spine_grow(guide, n, l, bd_p, seeds):
+    N = n.max()
+    bend = bend_noise(seeds, max(N-1, 0), l, bd_p)
+    spine = np.zeros((len(n), N, 3))
+    spine[:, 1] = normalized(guide)*l[:, None]
+    for k in range(3, N+1):
+        act = np.nonzero(n >= k)[0]
+        old_vec = spine[act, k-2]-spine[act, k-3]
+        new_vec = spine_bend(old_vec, k, n[act], bd_p, guide[act], bend[act, k-2])
+        spine[act, k-1] = spine[act, k-2] + normalized(new_vec)*l[act, None]
+    return spine
+
+# bends an existing spine, the remaining segments share one running rotation instead of being re-rotated each step
+def spine_regrow(spine, n, l, bd_p, guide, seed):
+    spine = np.array(spine, dtype=np.float64)
+    segs = spine - np.roll(spine, 1, axis=0)
+    bend = bend_noise([seed], 2, [l], bd_p)[:, 1]
+    rot = np.identity(3)
+    for i in range(2, len(spine)):
+        if i < n-1:
+            old_vec = spine[i-1]-spine[i-2]
+            new_vec = spine_bend(old_vec[None], 3, n, bd_p, np.asarray(guide)[None], bend)[0]
+            rot = rotations_between(old_vec, new_vec)@rot
+        spine[i] = rot@segs[i]+spine[i-1]
+    return spine
+
+def spine_jiggle(spine, n, l, length, rp, seeds):
+    p_a, p_s = rp[:2]
+    jigf = lambda z, p_seed: p_a*(noise(np.stack(np.broadcast_arrays(0.0, p_seed, p_s*z), axis=-1))-0.5)
+    B, N = spine.shape[:2]
+    seeds = np.asarray(seeds, dtype=np.float64)[:, None]
+    z, length = np.arange(N)*l[:, None], length[:, None]
+    offset = np.stack((jigf(z, seeds)-jigf(0, seeds), jigf(z+length, seeds)-jigf(length, seeds)), axis=-1)
+
+    st = spine[:, 1]-spine[:, 0]
+    zero = np.zeros(B)
+    side = np.where((st[:, 0] != st[:, 1])[:, None], np.stack((st[:, 1], -st[:, 0], zero), axis=-1), np.stack((st[:, 2], zero, -st[:, 0]), axis=-1))
+    ref = normalized(np.cross(st, side))
+
+    # every point moves relative to the already jiggled previous point
+    out = spine.copy()
+    for i in range(1, N):
+        act = np.nonzero(n > i)[0]
+        seg = spine[act, i]-out[act, i-1]
+        x = normalized(np.einsum('bij,bj->bi', rotations_between(st[act], seg), ref[act]))
+        y = normalized(np.cross(x, seg))
+        out[act, i] = spine[act, i] + x*offset[act, i, :1] + y*offset[act, i, 1:]
+    return out
 
 def spine_weight(spine, n, l, r, trunk, bd_p):
     b_c, b_w = bd_p[2], bd_p[4]
 
-    weight = lambda x, ang: math.sin(ang)*(1-x)*l*n #it has influences from trunk working cross section, weight of the branch (without child-branches), angle of the branch
-
-    for i in range(n-2):
-        vec = spine[i] - spine[i-1] #get previous vector
-        angle = (Vector((0,0,1)).angle(vec))
-        CM_lis = [spine[v]*(1-(v)/n) for v in range(i+1,n)]
-        CM = Vector((0,0,0))
-        for v in CM_lis:
-            CM += v
-        CM = CM/((n-i-1)*(n-i)/(2*n))-spine[i]
-        w_angle = CM[0]**2+CM[1]**2-(r*math.cos(angle))**2
-        if w_angle<0: w_angle = 0
-        w_angle = weight(i/n, math.atan(w_angle**0.5/(CM[2]+r*math.sin(angle))))
-        
-        trans1 = Matrix.Translation(-1*spine[i])
-        trans2 = Matrix.Translation(spine[i])
-        quat = Quaternion(Vector((vec[1], -vec[0],0)), -w_angle*b_w)
-        spine[i:] = [trans2@(quat@(trans1@vec)) for vec in spine[i:]]
+    weight = lambda x, ang, l, n: np.sin(ang)*(1-x)*l*n #it has influences from trunk working cross section, weight of the branch (without child-branches), angle of the branch
+
+    # every step rotates the whole remaining tail around spine[i], so the tail is always
+    # the original points under one accumulated rotation, which makes suffix sums enough for the center of mass
+    B, N = spine.shape[:2]
+    idx = np.arange(N)
+    valid = idx < n[:, None]
+    w = np.where(valid, 1-idx/n[:, None], 0)
+    wsum = np.cumsum((spine*w[..., None])[:, ::-1], axis=1)[:, ::-1] #wsum[b, i] = sum of w*spine[b, v] for v>=i
+    segs = spine - np.roll(spine, 1, axis=1)
+    segs[:, 0] = spine[:, 0]-spine[np.arange(B), n-1] #segs[b, i] = spine[b, i] - spine[b, i-1]
+    count = (n[:, None]-idx-1)*(n[:, None]-idx)/(2*n[:, None])
+    cms = np.zeros_like(spine)
+    cms[:, :-1] = wsum[:, 1:]/np.where(count[:, :-1] > 0, count[:, :-1], 1)[..., None]-spine[:, :-1]
+
+    rots = np.empty((B, N, 3, 3))
+    rot = np.tile(np.identity(3), (B, 1, 1))
+    for i in range(N-2):
+        rots[:, i] = rot
+        act = np.nonzero(n-2 > i)[0]
+        vec = np.einsum('bij,bj->bi', rot[act], segs[act, i])
+        CM = np.einsum('bij,bj->bi', rot[act], cms[act, i])
+        angle = angle_from_z(vec)
+        w_angle = np.maximum(CM[:, 0]**2+CM[:, 1]**2-(r[act]*np.cos(angle))**2, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w_angle = weight(i/n[act], np.arctan(w_angle**0.5/(CM[:, 2]+r[act]*np.sin(angle))), l[act], n[act])
+        axis = np.stack((vec[:, 1], -vec[:, 0], np.zeros(len(act))), axis=-1)
+        rot[act] = axis_angle(axis, -w_angle*b_w)@rot[act]
+    rots[:, max(N-2, 0):] = rot[:, None]
+
+    # each segment ends up turned by the rotation of the step it was pivoted at
+    spine = spine.copy()
+    spine[:, 1:] = spine[:, :1]+np.cumsum(np.einsum('bnij,bnj->bni', rots[:, 1:], segs[:, 1:]), axis=1)
 
     if trunk:
-        CM = Vector([sum([i[0] for i in spine])/n, sum([i[1] for i in spine])/n, sum([i[2] for i in spine])/n])
-        quat = Quaternion(Vector((CM[1],-CM[0],0)), Vector((0,0,1)).angle(CM)*b_c)
-        spine[:] = [quat@i for i in spine]
+        CM = np.sum(spine*valid[..., None], axis=1)/n[:, None]
+        axis = np.stack((CM[:, 1], -CM[:, 0], np.zeros(B)), axis=-1)
+        spine = np.einsum('bij,bnj->bni', axis_angle(axis, angle_from_z(CM)*b_c), spine)
     
     return spine
 
-def spine_jiggle(spine, l, length, rp):
-    p_a, p_s, p_seed = rp
-    jigf = lambda z : p_a*(noise.noise(Vector([0, p_seed, p_s*z]))-0.5)
-    st = spine[1]-spine[0]
-    ref = []
-    if st[0]!=st[1]:
-        ref = st.cross(Vector((st[1],-st[0],0))).normalized()
-    else:
-        ref = st.cross(Vector((st[2],0,-st[0]))).normalized()
-    for i in range(1,len(spine)):
-        x = (st.rotation_difference(spine[i]-spine[i-1])@ref).normalized()
-        y = x.cross(spine[i]-spine[i-1]).normalized()
-        spine[i]+=x*(jigf(i*l)-jigf(0)) + y*(jigf(i*l+length)-jigf(length))
-    return spine
+# grows B spines from their origins along their guides, returns the padded (B, N, 3) spines and the point counts
+def grow(origin, guide, radius, length, l, seeds, bd_p, r_p, trunk):
+    n = np.round(length/l).astype(int)+1
+    spines = spine_grow(guide, n, l, bd_p, seeds[0])
+    spines = spine_jiggle(spines, n, l, length, r_p, seeds[1])
+    return spine_weight(spines, n, l, radius, trunk, bd_p)+origin[:, None], n
+
+# the points of the given spans packed together, span i is count[i] points from start[i]
+def spans(start, count):
+    offset = np.concatenate(([0], np.cumsum(count)[:-1]))
+    return np.repeat(np.asarray(start)-offset, count)+np.arange(np.sum(count, dtype=np.int64))
+
 # BARK
-# number of sides, radius
-def bark_circle(n,r):
-    circle = []
-    if n<3 or r==0:
-        return []
-    else:
-        for i in range(n):
-            circle.append(Vector((r*math.cos(2*math.pi*i/n), r*math.sin(2*math.pi*i/n), 0)))
+# unit circle with n sides, computed once per side count
+@lru_cache(maxsize=None)
+def bark_circle(n):
+    a = 2*np.pi*np.arange(n)/n
+    circle = np.stack((np.cos(a), np.sin(a), np.zeros(n)), axis=-1)
+    circle.flags.writeable = False
     return circle
 
-def bark_gen(spine, m_p, t_p):
+# rings of all the given branches as one (sum of rings*sides, 3) float32 array, written into out if given
+# spine holds the points of all branches one after another, branch i has rings[i] of them
+def bark_gen(spine, rings, sides, radius, tipradius, t_p, out=None):
     # parameters
-    sides, radius, tipradius = m_p[0], m_p[2], m_p[3]
     flare_f, flare_a = t_p[:2]
-    n = len(spine)
+    rings, sides = np.asarray(rings), np.asarray(sides)
+    start = np.concatenate(([0], np.cumsum(rings)))
+    v_start = np.concatenate(([0], np.cumsum(rings*sides)))
+    spine = np.asarray(spine, dtype=np.float64).reshape(-1, 3)
 
-    scale_list = [max(flare_f(i/n, flare_a)*radius, tipradius) for i in range(n)]
+    # position of every point along its own branch
+    owner = np.repeat(np.arange(len(rings)), rings)
+    local = np.arange(len(spine))-start[owner]
+    radius = np.asarray(radius)[owner]
+    tipradius = np.asarray(tipradius)[owner]
+    scale_list = np.maximum(flare_f(local/rings[owner], flare_a)*radius, tipradius)
 
-    # generating bark with scaling and rotation based on parameters and spine
-    quat = Vector((0,0,1)).rotation_difference(spine[1]-spine[0])
-    bark = [(quat@i)+spine[0] for i in bark_circle(sides,scale_list[0])]
-    
-    for x in range(1, n-1):
-        vec = spine[x+1] - spine[x-1]
-        quat = Vector((0,0,1)).rotation_difference(vec)
-        new_circle = [quat @ i for i in bark_circle(sides,scale_list[x])]
-        for y in new_circle:
-            bark.append((Vector(spine[x]) + Vector(y)))
-    
-    bark += [(quat@i + Vector(spine[-1])) for i in bark_circle(sides,scale_list[-1])]
-    return bark
-
-#number of sides, number of vertices, generates faces
-def face_gen(s, n):
-    faces = []
-    for i in range(n-1):
-        for j in range(s):
-            if j != s-1:
-                faces.append(tuple([j+s*i, j+1+s*i, j+1+(i+1)*s, j+(i+1)*s]))
-            else:
-                faces.append(tuple([j+s*i, s*i, s*(i+1), j+s*(i+1)]))
-    
+    # ring directions, first segment, central differences and the last ring reuses the previous one
+    last = local == rings[owner]-1
+    nxt = np.minimum(local+1, rings[owner]-1)
+    prv = np.maximum(local-1-last, 0)
+    dirs = spine[start[owner]+nxt]-spine[start[owner]+prv]
+
+    # rotating all the scaled circles at once and moving them onto the spine, once per side count
+    frames = rotations_from_z(dirs)*scale_list[:, None, None]
+    if out is None:
+        out = np.empty((v_start[-1], 3), dtype=np.float32)
+    for s in np.unique(sides):
+        pts = np.nonzero(sides[owner] == s)[0]
+        idx = (v_start[owner[pts]]+local[pts]*s)[:, None]+np.arange(s)
+        out[idx] = np.einsum('nij,sj->nsi', frames[pts], bark_circle(s))+spine[pts, None, :]
+    return out
+
+#number of sides, number of rings, quad indices of a single branch, built once per shape
+@lru_cache(maxsize=256)
+def face_template(s, n):
+    ring = np.arange(s, dtype=np.int32)
+    rows = np.arange(n-1, dtype=np.int32)[:, None]*s
+    cur = (rows+ring).ravel()
+    nxt = (rows+(ring+1)%s).ravel()
+    faces = np.stack((cur, nxt, nxt+s, cur+s), axis=-1)
+    faces.flags.writeable = False
     return faces
 
+#number of sides, number of vertices, generates faces shifted by offset, written into out if given
+def face_gen(s, n, offset=0, out=None):
+    if out is None:
+        return face_template(s, n)+np.int32(offset)
+    np.add(face_template(s, n), offset, out=out)
+    return out
+
 # BRANCHES AND TREE GENERATION
 # outputs [place of the branch, vector that gives branch angle and size, radius of the branch]
 
@@ -125,220 +208,634 @@ def guides_gen(spine, lim, m_p, br_p, t_p, qual):
     scale_f1, flare, scale_f2, shift = t_p
     
     if radius == tipradius:
-        return []
+        return noguides()
     
     l = m_p[5]
     spine = spine[floor(start_h*len(spine)):]
-    random.seed(sd)
-    grid = [[]]
+    frames = rotations_from_z(spine[1:]-spine[:-1]).tolist()
+    pts = spine.tolist()
+    rng = random.Random(sd)
+    grid = spatialhash(lim)
+    sol = []
     orgs = []
     heights = []
     idx = len(spine)-2
     dist = 1/3*length*scaling
     ran = ceil(len(spine)/4)
+    row = 0 #only points from the last ran rows are checked against
     while idx>0:
         found = False
         for i in range(qual):
-            npt, origin, h = ptgen(spine, dist, idx, scale_f1, flare, horizontal)
-            if check(npt, grid, lim, idx, ran):
-                grid[-1].append(npt)
+            npt, origin, h = ptgen(pts, frames, dist, idx, scale_f1, flare, horizontal, rng)
+            if grid.check(npt, lim, row-ran+1):
+                grid.add(npt, row)
+                sol.append(npt)
                 orgs.append(origin)
                 heights.append(h)
                 found = True
         if not found:
             idx-=1
-            grid.append([])
+            row+=1
+    if not sol:
+        return noguides()
+    sol, orgs, heights = np.array(sol), np.array(orgs), np.array(heights)
     
-    radii = lambda h, guide_l: min(max(scale_f1(h*(1-start_h)+start_h, flare)*radius*0.8, tipradius), guide_l/length*radius)
+    radii = lambda h, guide_l: np.minimum(np.maximum(scale_f1(h*(1-start_h)+start_h, flare)*radius*0.8, tipradius), guide_l/length*radius)
     lengthten = lambda h : length*scaling*scale_f2(h, shift)
-    sol = [v for seg in [lis for lis in grid if lis] for v in seg]
-    guides = [(sol[i] - orgs[i]).normalized()*lengthten(heights[i]) for i in range(len(sol))] #creating local guides and adjusting length
+    guides = normalized(sol - orgs)*lengthten(heights)[:, None] #creating local guides and adjusting length
     
-    for i in range(len(guides)):
-        h = heights[i]
-        ang = (math.pi/2-(h*minang+(1-h)*maxang))*random.uniform(1-var,1+var)
-        guides[i] = Quaternion((spine[floor(h)]-spine[ceil(h)]).cross(guides[i]), ang)@guides[i]
+    ang = (math.pi/2-(heights*minang+(1-heights)*maxang))*np.array([rng.uniform(1-var,1+var) for i in range(len(guides))])
+    axis = np.cross(spine[np.floor(heights).astype(int)]-spine[np.ceil(heights).astype(int)], guides)
+    guides = np.einsum('gij,gj->gi', axis_angle(axis, ang), guides)
     
-    guidepacks = [[orgs[i],guides[i]*random.uniform(1-var, 1+var), radii(heights[i]/(1-start_h)-start_h, guides[i].length)] for i in range(len(orgs))] #creating guidepacks and radii
-    return guidepacks
+    spread = np.array([rng.uniform(1-var, 1+var) for i in range(len(guides))])
+    radii = radii(heights/(1-start_h)-start_h, np.linalg.norm(guides, axis=-1))
+    return orgs, guides*spread[:, None], radii #packed guides, origins and radii
 
 def fastguides_gen(spine, number, m_p, br_p, t_p):
     n = len(spine)
     length, radius, tipradius = m_p[1:4]
     minang, maxang, start_h, horizontal, var, scaling, br_seed = br_p[1:]
     scale_f1, flare, scale_f2, shift = t_p
-    guidepacks = []
-    random.seed(br_seed)
-    chosen = pseudo_poisson_disc(number, length, radius)
-    for i in range(number):
-        height = chosen[i][1]*radius/length*(1-start_h)+start_h
-        pick = math.floor(n*height)
-        trans_vec = spine[pick]*(height*n-pick)+spine[pick]*(pick+1-height*n)
-        x = (height-start_h)/(1-start_h)
-        ang = minang*x+maxang*(1-x)
-        ang += random.uniform(-var*ang,var*ang)
-        a = chosen[i][0]
-        quat = Vector((0,0,1)).rotation_difference(spine[pick]-spine[pick-1])
-        dir_vec = Vector((math.sin(ang)*math.cos(a),math.sin(ang)*math.sin(a), math.cos(ang))).normalized()
-        guide_vec = quat @ dir_vec
-        guide_vec *= length*scaling*scale_f2(x, shift)*random.uniform(1-var, 1+var)
-        guide_r = bl_math.clamp(scale_f1(height, flare)*radius*0.8, tipradius, guide_vec.length/length*radius)
-        guidepacks.append((trans_vec, guide_vec, guide_r))
-    return guidepacks
-
-class branch():
-    def __init__(self, pack, m_p, bd_p, br_p, r_p, trunk):
-        self.pack = pack
-        self.mp = [m_p[0], self.pack[1].length, self.pack[2], m_p[3], m_p[4], bl_math.clamp(m_p[5], 0, self.pack[1].length/2)]
-        self.bdp = bd_p
-        self.brp = br_p
-        self.rp = r_p
-        self.trunk = trunk
-        self.guidepacks=[]
-        self.n = 0
-        self.spine=[]
-        
-    def generate(self):
-        self.n = round(self.mp[1]/self.mp[5])+1
-        self.spine = [Vector((0,0,0))]
-        self.spine.append((self.pack[1].normalized())*self.mp[5])
-
-        while len(self.spine)<self.n:
-            self.spine.append(self.mp[5]*((self.spine[-1] - self.spine[-2]).normalized())+self.spine[-1])
-            self.spine = spine_bend(self.spine, self.n, self.bdp, self.mp[5], self.pack[1], 'spine')
-        self.spine = spine_jiggle(self.spine, self.mp[5], self.mp[1], self.rp)
-        self.spine = spine_weight(self.spine, self.n, self.mp[5], self.mp[2], self.trunk, self.bdp)
-
-        self.spine = [vec+self.pack[0] for vec in self.spine]
-        return self
+    rng = random.Random(br_seed)
+    chosen = np.array(pseudo_poisson_disc(number, length, radius, rng)).reshape(-1, 2)
+    height = chosen[:, 1]*radius/length*(1-start_h)+start_h
+    pick = np.floor(n*height).astype(int)
+    trans_vec = spine[pick]*(height*n-pick)[:, None]+spine[pick]*(pick+1-height*n)[:, None]
+    x = (height-start_h)/(1-start_h)
+    ang = minang*x+maxang*(1-x)
+    draws = np.array([(rng.uniform(-var*a,var*a), rng.uniform(1-var, 1+var)) for a in ang]).reshape(-1, 2)
+    ang += draws[:, 0]
+    a = chosen[:, 0]
+    dir_vec = normalized(np.stack((np.sin(ang)*np.cos(a), np.sin(ang)*np.sin(a), np.cos(ang)), axis=-1))
+    guide_vec = np.einsum('gij,gj->gi', rotations_from_z(spine[pick]-spine[pick-1]), dir_vec)
+    guide_vec *= (length*scaling*scale_f2(x, shift)*draws[:, 1])[:, None]
+    guide_r = clamp(scale_f1(height, flare)*radius*0.8, tipradius, np.linalg.norm(guide_vec, axis=-1)/length*radius)
+    return trans_vec, guide_vec, guide_r
+
+# packed guides of a branch without children
+def noguides():
+    return np.empty((0, 3)), np.empty((0, 3)), np.empty(0)
+
+# child guides of one parent, a job only holds plain data so a process pool can run it
+def guides(job):
+    spine, density, mp, brp, t_p, typ, qual = job
+    if typ == 'fancy':
+        return guides_gen(spine, 1/density, mp, brp, t_p, qual)
+    elif typ == 'fast':
+        num = lambda d, l: ceil((2.2*l+11)*d**(1.37*l**0.1))
+        return fastguides_gen(spine, num(density, mp[1]), mp, brp, t_p)
+    return noguides()
+
+# one level of branches as flat arrays instead of an object per branch, branch i has the points
+# spine[start[i]:start[i+1]], it grew from branch parent[i] of the level above as its child[i]-th child
+# and paths[i] are the child indices leading to it from the trunk
+class branchtable():
+    def __init__(self, level, count=0):
+        self.level = level
+        self.parent = np.full(count, -1, dtype=np.int32)
+        self.child = np.full(count, -1, dtype=np.int32)
+        self.paths = np.zeros((count, level), dtype=np.int32)
+        self.sides = np.zeros(count, dtype=np.int32)
+        self.length = np.zeros(count)
+        self.radius = np.zeros(count)
+        self.tipradius = np.zeros(count)
+        self.segment = np.zeros(count) #length of a spine segment
+        self.start = np.zeros(count+1, dtype=np.int64)
+        self.spine = np.empty((0, 3))
+    
+    def __len__(self):
+        return len(self.sides)
     
-    def regenerate(self):
-        for i in range(2, self.n-1):
-            quat = spine_bend(self.spine[i-2:i+1], self.n, self.bdp, self.mp[5], self.pack[1], 'quat')
-            self.spine[i:] = [quat@(self.spine[k]-self.spine[i-1])+self.spine[i-1] for k in range(i,len(self.spine))]
-        self.spine = spine_jiggle(self.spine, self.mp[5], self.mp[1], self.rp)
-        self.spine = spine_weight(self.spine, self.n, self.mp[5], self.mp[2], self.trunk,self.bdp)
+    def path(self, i):
+        return tuple(self.paths[i].tolist())
     
-    def guidesgen(self, density, t_p, typ, qual):
-        self.childmp = [int(max(self.mp[0]//2+1, 3)), self.mp[1], self.mp[2], self.mp[3], self.mp[4], self.mp[5]]
-        if typ == 'fancy':
-            self.guidepacks = guides_gen(self.spine, 1/density, self.mp, self.brp, t_p, qual)
-        elif typ == 'fast':
-            num = lambda d, l: ceil((2.2*l+11)*d**(1.37*l**0.1))
-            self.guidepacks = fastguides_gen(self.spine, num(density, self.mp[1]), self.mp, self.brp, t_p)
+    def points(self, i):
+        return self.spine[self.start[i]:self.start[i+1]]
     
-    def interpolate(self, lev):
-        if len(self.spine)>3:
-            sp = self.spine
-            a=0.1
-            for l in range(lev):
-                pt = (0.5+a)*sp[1]+(0.5+a)*sp[2]-a*(sp[0]+sp[3])
-                sp.insert(2, pt)
-                i = 3
-                while i<len(sp)-2:
-                    pt = (0.5+a)*sp[i]+(0.5+a)*sp[i+1]-a*(sp[i-2]+sp[i+2])
-                    sp.insert(i+1, pt)
-                    i+=2
-            self.spine = sp
-            self.n = len(sp)
+    # branch i as the m_p list the guides work with, scale is applied to the mesh only
+    def mp(self, i):
+        return [int(self.sides[i]), float(self.length[i]), float(self.radius[i]), float(self.tipradius[i]), 1.0, float(self.segment[i])]
+    
+    # bends and jiggle noise offsets derived from the paths, the children seed is derived in guidesjob
+    def seeds(self, bd_p, r_p, part=slice(None)):
+        paths = [self.path(i) for i in range(len(self))[part]]
+        return ([branchseed(bd_p[-1], 'bends', path)/2**64*256 for path in paths],
+                [branchseed(r_p[2], 'jiggle', path)/2**64*256 for path in paths])
+    
+    # grows the spines of the whole level in lockstep
+    def grow(self, origin, guide, bd_p, r_p, trunk):
+        return drain(self.growsteps(origin, guide, bd_p, r_p, trunk))
+    
+    # grows the spines chunk by chunk, yields (branches grown, branches) after every chunk
+    def growsteps(self, origin, guide, bd_p, r_p, trunk, chunk=256):
+        spines, counts = [], []
+        for first in range(0, len(self), chunk):
+            part = slice(first, first+chunk)
+            spine, n = grow(origin[part], guide[part], self.radius[part], self.length[part], self.segment[part],
+                            self.seeds(bd_p, r_p, part), bd_p, r_p, trunk)
+            spines.append(spine[np.arange(spine.shape[1]) < n[:, None]])
+            counts.append(n)
+            yield min(first+chunk, len(self)), len(self)
+        if spines:
+            self.start = np.concatenate(([0], np.cumsum(np.concatenate(counts))))
+            self.spine = np.concatenate(spines)
+        return self
+    
+    # a copy of the level with other sides and tip radius, the spines are shared and never changed
+    def retargeted(self, sides, tipradius):
+        table = copy.copy(self)
+        table.sides = np.full(len(self), sides, dtype=np.int32)
+        table.tipradius = np.full(len(self), tipradius)
+        return table
+    
+    def guidesjob(self, i, density, br_p, t_p, typ, qual):
+        return (self.points(i), density, self.mp(i), br_p[:-1]+[branchseed(br_p[-1], 'children', self.path(i))], t_p, typ, qual)
+
+# the trunk as a level of one branch, grown along guide from origin
+def trunktable(origin, guide, m_p):
+    table = branchtable(0, 1)
+    table.sides[:], table.radius[:], table.tipradius[:] = m_p[0], m_p[2], m_p[3]
+    table.length[:] = float(np.linalg.norm(guide))
+    table.segment[:] = clamp(m_p[5], 0, table.length/2)
+    return table
+
+# the next level from the packed guides every parent of the level above placed, packs[i] belong to parent i
+# children get about half the sides of their parent and their segments are never longer than half the branch
+def sprout(parents, packs, bd_p, r_p):
+    return drain(sprout_steps(parents, packs, bd_p, r_p))
+
+# sprout as steps, yields (branches grown, branches) while the level grows
+def sprout_steps(parents, packs, bd_p, r_p):
+    counts = np.array([len(pack[2]) for pack in packs], dtype=np.int64)
+    table = branchtable(parents.level+1, int(counts.sum()))
+    if not len(table):
+        return table
+    table.parent[:] = np.repeat(np.arange(len(parents)), counts)
+    table.child[:] = np.arange(len(table))-np.repeat(np.cumsum(counts)-counts, counts)
+    table.paths[:] = np.concatenate((parents.paths[table.parent], table.child[:, None]), axis=1)
+    origin, guide, radius = (np.concatenate([pack[k] for pack in packs]) for k in range(3))
+    table.sides[:] = np.maximum(parents.sides//2+1, 3)[table.parent]
+    table.length[:] = np.linalg.norm(guide, axis=-1)
+    table.radius[:] = radius
+    table.tipradius[:] = parents.tipradius[table.parent]
+    table.segment[:] = clamp(parents.segment[table.parent], 0, table.length/2)
+    return (yield from table.growsteps(origin.reshape(-1, 3), guide.reshape(-1, 3), bd_p, r_p, False))
+
+# runs a step generator to the end and returns its result
+def drain(steps):
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
 
 # THE MIGHTY TREE GENERATION
 
-def outgrow(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p):
-    #creating the rest of levels
-    for lev in range(br_p[0]):
-        branchlist.append([])
-        for parent in branchlist[-2]:
-            parent.guidesgen(bn_p[lev], t_p, e_p[1], e_p[2])
-            children = parent.guidepacks
-            for pack in children:
-                r_p[2] +=1
-                bd_p[-1] +=1
-                br_p[-1] +=1
-                branchlist[-1].append(branch(pack, parent.childmp, bd_p, br_p, r_p, False).generate())
-        br_p[3]=br_p[3]**2 #temporary workaround
-    br_p[3]=br_p[3]**((0.5)**br_p[0]) 
+def outgrow(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p, pool=None, timer=None):
+    for step in outgrow_steps(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p, pool, timer):
+        pass
     return branchlist
 
+# creating the missing levels, with a pool the guides of every parent are placed in worker processes
+# yields (level, fraction of the level done) after every chunk of parents placing guides and of children growing
+def outgrow_steps(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p, pool=None, timer=None, chunk=64):
+    for lev in range(len(branchlist)-1, br_p[0]):
+        lev_brp = br_p[:3]+[br_p[3]**(2**lev)]+br_p[4:] #temporary workaround, start height shrinks with every level
+        parents = branchlist[-1]
+        packs = []
+        for first in range(0, len(parents), chunk):
+            jobs = [parents.guidesjob(i, bn_p[lev], lev_brp, t_p, e_p[1], e_p[2]) for i in range(first, min(first+chunk, len(parents)))]
+            if pool is None:
+                packs.extend(map(guides, jobs))
+            else:
+                packs.extend(pool.map(guides, jobs, chunksize=max(1, len(jobs)//64)))
+            yield lev, len(packs)/len(parents)/2
+        children = sprout_steps(parents, packs, bd_p, r_p)
+        while True:
+            try:
+                grown, total = next(children)
+            except StopIteration as grown:
+                branchlist.append(grown.value)
+                break
+            yield lev, 0.5+grown/total/2
+        if timer: timer.lap('level %d' % (lev+1))
+        yield lev, 1.0
+
+# all levels one after another as arrays over every branch of the tree, parent indexes these arrays too
+def flattened(branchlist):
+    sizes = [len(table) for table in branchlist]
+    offset = np.concatenate(([0, 0], np.cumsum(sizes)[:-1])) #of the level above
+    spine_offset = np.concatenate(([0], np.cumsum([len(table.spine) for table in branchlist])))
+    join = lambda name: np.concatenate([getattr(table, name) for table in branchlist])
+    return {
+        'spine': np.concatenate([table.spine for table in branchlist]),
+        'start': np.concatenate([table.start[:-1]+spine_offset[lev] for lev, table in enumerate(branchlist)]+[spine_offset[-1:]]),
+        'level': np.repeat(np.arange(len(branchlist)), sizes),
+        'parent': np.concatenate([np.where(table.parent < 0, -1, table.parent+offset[lev]) for lev, table in enumerate(branchlist)]),
+        'child': join('child'),
+        'sides': join('sides'),
+        'length': join('length'),
+        'radius': join('radius'),
+        'tipradius': join('tipradius'),
+        'segment': join('segment'),
+    }
+
+# order in which toverts meshes the flattened branches, branches already as thin as their tip move from
+# their level to the front of the last one, also returns how many end up in the last one
+def meshorder(level, radius, tipradius, levels):
+    inner = level < levels-1
+    thin = inner & (radius == tipradius)
+    order = np.concatenate((np.nonzero(inner & ~thin)[0], np.nonzero(thin)[0][::-1], np.nonzero(~inner)[0]))
+    return order, len(order)-np.count_nonzero(inner & ~thin)
+
+# point counts of the spines after lev subdivision passes
+def meshrings(rings, lev):
+    for l in range(lev):
+        rings = np.where(rings > 3, 2*rings-3, rings)
+    return rings
+
+# four point subdivision of packed spines, every pass adds a point between each pair of inner points
+# of the branches with more than 3 points, returns the new spines and point counts
+def interpolated(spine, rings, lev):
+    a = 0.1
+    for l in range(lev):
+        start = np.concatenate(([0], np.cumsum(rings)[:-1]))
+        sub = rings > 3
+        new_rings = meshrings(rings, 1)
+        new_start = np.concatenate(([0], np.cumsum(new_rings)[:-1]))
+        out = np.empty((new_rings.sum(), 3))
+
+        # the old points, the inner ones of subdivided branches move to every other place
+        local = np.arange(len(spine))-np.repeat(start, rings)
+        owner = np.repeat(np.arange(len(rings)), rings)
+        moved = sub[owner] & (local >= 2)
+        place = np.where(moved, np.where(local == rings[owner]-1, 2*local-2, 2*local-1), local)
+        out[new_start[owner]+place] = spine
+
+        # the new points, between old points k+1 and k+2
+        k = spans(start[sub], rings[sub]-3)
+        pts = (0.5+a)*(spine[k+1]+spine[k+2])-a*(spine[k]+spine[k+3])
+        out[spans(new_start[sub]+2, rings[sub]-3)+(k-np.repeat(start[sub], rings[sub]-3))] = pts
+        spine, rings = out, new_rings
+    return spine, rings
+
 def toverts(branchlist, facebool, m_p, br_p, t_p, e_p):
-    for lev in range(len(branchlist)-1):
-        bran_i = 0
-        while bran_i<len(branchlist[lev]):
-            if branchlist[lev][bran_i].mp[2]==branchlist[lev][bran_i].mp[3]:
-                branchlist[-1].insert(0, branchlist[lev].pop(bran_i))
-            else:bran_i+=1
+    return drain(toverts_steps(branchlist, facebool, m_p, br_p, t_p, e_p))
 
+# toverts as steps, yields the fraction of the bark done after every chunk of branches and returns the buffers
+def toverts_steps(branchlist, facebool, m_p, br_p, t_p, e_p, chunk=256):
+    flat = flattened(branchlist)
+    order, last = meshorder(flat['level'], flat['radius'], flat['tipradius'], len(branchlist))
+    rings = np.diff(flat['start'])[order]
+    spine, rings = interpolated(flat['spine'][spans(flat['start'][order], rings)], rings, e_p[0])
+    v_start = np.concatenate(([0], np.cumsum(rings)))
 
     #IF NOT FACEBOOL
     if not facebool:
-        verts = []
-        edges =[]
-        for lev in branchlist:
-            for bran in lev:
-                if e_p[0]!=0:bran.interpolate(e_p[0])
-                verts.extend(bran.spine)
-                if edges: edges += [[n+edges[-1][1]+1,n+2+edges[-1][1]] for n in range(len(bran.spine))][:-1]
-                else: edges += [(n,n+1) for n in range(len(bran.spine))][:-1]
-        verts = [vec*m_p[4] for vec in verts] #scale update
-        return verts, edges, [], [], []
+        verts = spine.astype(np.float32)
+
+        #chaining the points of each branch, without linking to the next branch
+        idx = np.delete(np.arange(v_start[-1]-1, dtype=np.int32), v_start[1:-1]-1)
+        edges = np.stack((idx, idx+1), axis=-1)
+        verts *= m_p[4] #scale update
+        return verts, edges, np.empty((0, 4), dtype=np.int32), [], np.empty((0, 3), dtype=np.int32)
     
     #FACEBOOL
-    faces=[]
-    
-    #generating faces
-    for lev in range(br_p[0]+1):
-        for bran in branchlist[lev]:
-            if e_p[0]!=0:bran.interpolate(e_p[0])
-            faces.append(face_gen(bran.mp[0], bran.n))
-            
-    #combining faces
-    while True:
-        if len(faces) == 1:
-            faces = faces[0]
-            break
-        faces[0].extend([[i+max(faces[0][-1])+1 for i in tup] for tup in faces.pop(1)])
-
-    #generating verts from spine and making selection
-    verts = []
-    selection=[0]
-    info=[]
-    for lev in range(len(branchlist)):
-        if lev == len(branchlist)-1:
-            selection[0] = len(verts)
-        for bran in branchlist[lev]:
-            info.append([0,bran.mp[0]*bran.n-1, bran.mp[0]])
-            verts.extend(bark_gen(bran.spine, bran.mp, t_p))
-    
-    selection = list(range(selection[0], len(verts)))
-    
-    for i in range(1,len(info)):
-        info[i][0]=info[i-1][1]+1
-        info[i][1]+=info[i][0]
+    #offsets of every branch in the spine, vertex and face buffers
+    p_start = v_start
+    sides = flat['sides'][order].astype(np.int64)
+    v_start = np.concatenate(([0], np.cumsum(sides*rings)))
+    f_start = np.concatenate(([0], np.cumsum(sides*(rings-1))))
+    radius, tipradius = flat['radius'][order], flat['tipradius'][order]
+
+    #generating verts from spine and faces straight into the buffers, a chunk of branches at a time
+    verts = np.empty((v_start[-1], 3), dtype=np.float32)
+    faces = np.empty((f_start[-1], 4), dtype=np.int32)
+    for first in range(0, len(order), chunk):
+        end = min(first+chunk, len(order))
+        part = slice(first, end)
+        bark_gen(spine[p_start[first]:p_start[end]], rings[part], sides[part], radius[part], tipradius[part], t_p,
+                 verts[v_start[first]:v_start[end]])
+        for i in range(first, end):
+            face_gen(sides[i], rings[i], v_start[i], faces[f_start[i]:f_start[i+1]])
+        yield end/len(order)
+
+    #branch ranges and selection of the furthest branches
+    info = np.stack((v_start[:-1], v_start[1:]-1, sides), axis=-1).astype(np.int32)
+    selection = list(range(v_start[len(order)-last], v_start[-1]))
 
     #flattening the base, 
-    for lev in range(m_p[0]):
-        verts[lev][2] = 0
+    verts[:m_p[0], 2] = 0
 
     #scaling the tree
-    verts = [vec*m_p[4] for vec in verts]
+    verts *= m_p[4]
     
-    return verts, [], faces, selection, info
+    return verts, np.empty((0, 2), dtype=np.int32), faces, selection, info
+
+# the branch log toverts returns, one (first vertex, last vertex, sides) row per branch, as one flat int32 array to store
+def packlog(info):
+    return np.ascontiguousarray(info, dtype=np.int32).ravel()
+
+# rows of a stored branch log, packed or as the list of [start, end, sides] lists older files have
+def unpacklog(log):
+    return np.asarray(log, dtype=np.int32).reshape(-1, 3)
 
+# the trunk from the points of a custom curve, bent, jiggled and weighted like a grown one
 def branchinit(verts, m_p, bd_p, br_p, r_p):
     m_p[3]*=m_p[2]
-    st_pack = (verts[0],(verts[1]-verts[0]).normalized()*m_p[1], m_p[2])
-    bran = branch(st_pack, m_p, bd_p, br_p, r_p, True)
-    bran.n = len(verts)
-    bran.spine = verts
-    bran.regenerate()
-    return [[bran]]
+    verts = np.asarray(verts, dtype=np.float64)
+    guide = normalized(verts[1]-verts[0])*m_p[1]
+    table = trunktable(verts[0], guide, m_p)
+    bends, jiggle = table.seeds(bd_p, r_p)
+    n, l, length, radius = np.array([len(verts)]), table.segment, table.length, table.radius
+    spine = spine_regrow(verts, len(verts), l[0], bd_p, guide, bends[0])[None]
+    spine = spine_jiggle(spine, n, l, length, r_p, jiggle)
+    table.spine = spine_weight(spine, n, l, radius, True, bd_p)[0]
+    table.start = np.array([0, len(verts)])
+    return [table]
+
+# grows the trunk of a tree
+def trunkinit(m_p, bd_p, br_p, r_p):
+    guide = np.array((0.0, 0.0, m_p[1]))
+    return [trunktable(np.zeros(3), guide, m_p).grow(np.zeros((1, 3)), guide[None], bd_p, r_p, True)]
+
+# SKELETON
+SKELETON_VERSION = 1
+
+# the grown branches as flat arrays in branchlist order, branch i is points[start[i]:start[i+1]]
+# its parent is branch parent[i] (-1 for the trunk) and child[i] its index among the parent's children,
+# vstart/vend is the range of its bark in a mesh toverts made with this info, -1 without faces
+def skeleton(branchlist, info=()):
+    skel = flattened(branchlist)
+    ranges = np.full((len(skel['sides']), 2), -1, dtype=np.int32)
+    if len(info):
+        order, last = meshorder(skel['level'], skel['radius'], skel['tipradius'], len(branchlist))
+        ranges[order] = unpacklog(info)[:, :2]
+    skel['points'] = skel.pop('spine').astype(np.float32)
+    for name in ('start', 'level', 'parent', 'child', 'sides'):
+        skel[name] = skel[name].astype(np.int32)
+    skel['vstart'], skel['vend'] = ranges[:, 0].copy(), ranges[:, 1].copy()
+    return skel
+
+# branch levels rebuilt from a skeleton, they mesh and grow new levels like the ones it was made from
+def unpack_skeleton(skel, br_p):
+    points = np.asarray(skel['points'], dtype=np.float64).reshape(-1, 3)
+    start, level = np.asarray(skel['start'], dtype=np.int64), np.asarray(skel['level'])
+    branchlist = []
+    first = 0
+    for lev in range(br_p[0]+1): #levels without branches are kept too
+        rows = np.arange(first, first+np.count_nonzero(level == lev))
+        table = branchtable(lev, len(rows))
+        if lev:
+            above = branchlist[-1]
+            table.parent[:] = np.asarray(skel['parent'])[rows]-(first-len(above))
+            table.child[:] = np.asarray(skel['child'])[rows]
+            table.paths[:] = np.concatenate((above.paths[table.parent], table.child[:, None]), axis=1)
+        for name in ('sides', 'length', 'radius', 'tipradius', 'segment'):
+            getattr(table, name)[:] = np.asarray(skel[name])[rows]
+        if len(rows):
+            table.start = start[first:rows[-1]+2]-start[first]
+            table.spine = points[start[first]:start[rows[-1]+1]]
+        branchlist.append(table)
+        first += len(rows)
+    return branchlist
 
+# PARAMETERS
+# settings of a tree, same names and defaults as the properties of the CalmTree panel
+DEFAULTS = {
+    'facebool': True,
+    'interp': 0,
+    'poisson_type': 'fancy',
+    'poisson_qual': 4,
+    'Msides': 10,
+    'Mlength': 7.0,
+    'Mradius': 0.25,
+    'Mtipradius': 0.005,
+    'Mscale': 1.0,
+    'Mvres': 30,
+    'Rperlin_amount': 0.1,
+    'Rperlin_scale': 1.0,
+    'Rperlin_seed': 1,
+    'bends_amount': 0.2,
+    'bends_up': 0.2,
+    'bends_correction': 0.3,
+    'bends_weight': 0.4,
+    'bends_scale': 1.5,
+    'bends_seed': 1,
+    'branch_levels': 2,
+    'branch_number1': 1.2,
+    'branch_number2': 1.0,
+    'branch_number3': 1.0,
+    'branch_maxangle': 70/360*2*math.pi,
+    'branch_minangle': 20/360*2*math.pi,
+    'branch_height': 0.25,
+    'branch_horizontal': 0.1,
+    'branch_variety': 0.1,
+    'branch_scaling': 0.3,
+    'branch_seed': 1,
+    'branch_shift': 0.5,
+    'flare_amount': 1.0,
+}
+
+# plain parameter object for generating without Blender, anything not given keeps its default
+class treeparams():
+    def __init__(self, **props):
+        unknown = set(props)-set(DEFAULTS)
+        if unknown:
+            raise TypeError('unknown tree parameters: '+', '.join(sorted(unknown)))
+        self.__dict__.update(DEFAULTS)
+        self.__dict__.update(props)
+
+# coarser settings for a quick look while a slider is dragged, a custom trunk keeps its resolution
+def previewparams(tps, custom=False):
+    props = {name: getattr(tps, name) for name in DEFAULTS}
+    if not custom:
+        props['Mvres'] = max(5, props['Mvres']//3)
+    props['Msides'] = max(4, props['Msides']//2)
+    props['interp'] = 0
+    props['poisson_qual'] = min(props['poisson_qual'], 2)
+    props['branch_levels'] = min(props['branch_levels'], 2)
+    for name in ('branch_number1', 'branch_number2', 'branch_number3'):
+        props[name] *= 0.75
+    return treeparams(**props)
+
+def scale_lf1(x, a): return 1/((x+1)**a) - \
+    (x/2)**a  # this one is for trunk flare
+def scale_lf2(x, a): return (4*x*(1-x)*((1-a**2)**0.5+1)/(2*(a*(2*x-1)+1))
+                             )**(0.5+0.5*abs(a))  # this one is for branches scale
+
+# turns the settings into the parameter lists, tps is the panel property group or anything with the same attributes
+def parameters(tps):
+    l = tps.Mlength/tps.Mvres
+    m_p = [tps.Msides, tps.Mlength, tps.Mradius, tps.Mtipradius, tps.Mscale, l]
+    br_p = [tps.branch_levels, tps.branch_minangle, tps.branch_maxangle, tps.branch_height,
+            tps.branch_horizontal, tps.branch_variety, tps.branch_scaling, tps.branch_seed]
+    bn_p = [tps.branch_number1, tps.branch_number2, tps.branch_number3]
+    bd_p = [tps.bends_amount, tps.bends_up, tps.bends_correction,
+            tps.bends_scale, tps.bends_weight/(tps.Mlength), tps.bends_seed]
+    t_p = [scale_lf1, tps.flare_amount, scale_lf2, tps.branch_shift]
+    r_p = [tps.Rperlin_amount, tps.Rperlin_scale, tps.Rperlin_seed]
+    e_p = [tps.interp, tps.poisson_type, tps.poisson_qual]
+    return m_p, br_p, bn_p, bd_p, r_p, t_p, e_p
+
+# grows the trunk and all levels of branches, curve is an optional custom trunk
+# pool is an optional multiprocessing.Pool or ProcessPoolExecutor, the tree is the same with or without it
+def growtree(tps, curve=None, pool=None, timer=None):
+    m_p, br_p, bn_p, bd_p, r_p, t_p, e_p = parameters(tps)
+    if curve is None:
+        branchlist = trunkinit(m_p, bd_p, br_p, r_p)
+    else:
+        branchlist = branchinit(curve, m_p, bd_p, br_p, r_p)
+    if timer: timer.lap('trunk')
+    branchlist = outgrow(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p, pool, timer)
+    return branchlist, (m_p, br_p, bn_p, bd_p, r_p, t_p, e_p)
+
+# generates the whole tree and returns the mesh buffers, a stagetimer collects the stage times and level counts
+def generate(tps, curve=None, pool=None, timer=None):
+    return treecache().generate(tps, curve, pool, timer)
+
+# STAGES
+# the trunk is stage 0, branch levels are stages 1 to 3, then the mesh and its scale
+TRUNK, MESH, SCALE = 0, 4, 5
+
+# first stage every setting feeds, changing it recomputes that stage and everything after it
+STAGES = {
+    'Mlength': TRUNK, 'Mradius': TRUNK, 'Mvres': TRUNK,
+    'Rperlin_amount': TRUNK, 'Rperlin_scale': TRUNK, 'Rperlin_seed': TRUNK,
+    'bends_amount': TRUNK, 'bends_up': TRUNK, 'bends_correction': TRUNK,
+    'bends_weight': TRUNK, 'bends_scale': TRUNK, 'bends_seed': TRUNK,
+    'Mtipradius': 1, 'flare_amount': 1, 'poisson_type': 1, 'poisson_qual': 1,
+    'branch_maxangle': 1, 'branch_minangle': 1, 'branch_height': 1, 'branch_horizontal': 1,
+    'branch_variety': 1, 'branch_scaling': 1, 'branch_seed': 1, 'branch_shift': 1,
+    'branch_number1': 1, 'branch_number2': 2, 'branch_number3': 3,
+    'branch_levels': MESH, #more levels only grow the new ones, see treecache.dirty
+    'Msides': MESH, 'interp': MESH, 'facebool': MESH,
+    'Mscale': SCALE,
+}
+
+# keeps the grown levels and the unscaled mesh of the last generation, so the next one
+# only recomputes the stages downstream of the settings that changed
+class treecache():
+    def __init__(self):
+        self.settings = None
+        self.curve = None
+        self.branchlist = []
+        self.mesh = None
+    
+    # first stage that is out of date for these settings and trunk curve
+    def dirty(self, settings, curve):
+        if self.settings is None or not np.array_equal(self.curve, curve):
+            return TRUNK
+        stage = SCALE+1 if self.mesh is not None else MESH #a restored cache has no mesh yet
+        for name, value in settings.items():
+            old = self.settings[name]
+            if value == old:
+                continue
+            if name == 'branch_levels' and value > old:
+                stage = min(stage, old+1)
+            else:
+                stage = min(stage, STAGES[name])
+        return stage
+    
+    def generate(self, tps, curve=None, pool=None, timer=None):
+        return drain(self.steps(tps, curve, pool, timer))
+    
+    # the generation as a resumable generator, yields (fraction done, stage name) after every step and
+    # returns the mesh buffers, the cache only takes the new levels once it finishes so it can be dropped at any step
+    def steps(self, tps, curve=None, pool=None, timer=None):
+        settings = {name: getattr(tps, name) for name in DEFAULTS}
+        stage = self.dirty(settings, curve)
+        m_p, br_p, bn_p, bd_p, r_p, t_p, e_p = parameters(tps)
+        total = br_p[0]+2 #trunk, levels and mesh
+        if stage == TRUNK:
+            if curve is None:
+                branchlist = trunkinit(m_p, bd_p, br_p, r_p)
+            else:
+                branchlist = branchinit(curve, m_p, bd_p, br_p, r_p)
+            if timer: timer.lap('trunk')
+        else:
+            if curve is not None:
+                m_p[3]*=m_p[2] #as branchinit does
+            # sides and tip radius of the kept branches follow the current settings, on copies
+            # so the cache keeps matching its settings if this run never finishes
+            branchlist = []
+            sides = m_p[0]
+            for table in self.branchlist[:min(stage, br_p[0]+1)]:
+                branchlist.append(table.retargeted(sides, m_p[3]))
+                sides = int(max(sides//2+1, 3))
+        yield 1/total, 'trunk'
+        mesh = self.mesh
+        if stage <= MESH:
+            for lev, done in outgrow_steps(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p, pool, timer):
+                yield (lev+1+done)/total, 'level %d' % (lev+1)
+            meshing = toverts_steps(branchlist, tps.facebool, m_p[:4]+[1.0]+m_p[5:], br_p, t_p, e_p)
+            while True:
+                try:
+                    done = next(meshing)
+                except StopIteration as finished:
+                    mesh = finished.value
+                    break
+                yield (br_p[0]+1+done)/total, 'mesh'
+            if timer: timer.lap('toverts')
+        self.branchlist, self.mesh = branchlist, mesh
+        self.settings, self.curve = settings, None if curve is None else np.array(curve)
+        verts = self.mesh[0]*np.float32(m_p[4])
+        if timer:
+            timer.lap('scale')
+            timer.levels(self.branchlist, tps.facebool, tps.interp)
+        return (verts,)+tuple(self.mesh[1:])
+    
+    # the grown levels with the settings they were grown with, plain arrays and strings that can be stored anywhere
+    def skeleton(self):
+        skel = skeleton(self.branchlist, self.mesh[4])
+        skel['version'] = SKELETON_VERSION
+        skel['settings'] = json.dumps(self.settings)
+        if self.curve is not None:
+            skel['curve'] = self.curve.astype(np.float64)
+        return skel
+    
+    # picks up the levels of a skeleton, the mesh is made again by the next generate
+    def restore(self, skel):
+        if skel['version'] != SKELETON_VERSION:
+            raise ValueError('skeleton version %s, expected %d' % (skel['version'], SKELETON_VERSION))
+        settings = json.loads(skel['settings'])
+        m_p, br_p, bn_p, bd_p, r_p, t_p, e_p = parameters(treeparams(**settings))
+        self.branchlist = unpack_skeleton(skel, br_p)
+        self.settings, self.mesh = settings, None
+        self.curve = np.array(skel['curve'], dtype=np.float64).reshape(-1, 3) if 'curve' in skel else None
+        return self
+
+# wall time of the generation stages and the size of every level, stats is plain data so it can be stored on the tree
+class stagetimer():
+    def __init__(self):
+        self.stats = {'stages': {}, 'levels': []}
+        self.last = time.perf_counter()
+    
+    # adds the time since the previous lap to the stage
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stats['stages'][stage] = self.stats['stages'].get(stage, 0.0)+now-self.last
+        self.last = now
+    
+    # branches, vertices and faces of every level as toverts meshes them, after interpolation
+    # and with the branches already thin as their tip counted to the last level
+    def levels(self, branchlist, facebool, interp=0):
+        join = lambda name: np.concatenate([getattr(table, name) for table in branchlist])
+        level = np.repeat(np.arange(len(branchlist)), [len(table) for table in branchlist])
+        order, last = meshorder(level, join('radius'), join('tipradius'), len(branchlist))
+        level = level[order]
+        level[len(order)-last:] = len(branchlist)-1
+        rings = meshrings(np.concatenate([np.diff(table.start) for table in branchlist])[order], interp)
+        sides = join('sides')[order] if facebool else np.ones(len(order), dtype=np.int64)
+        count = lambda weights: np.bincount(level, weights, minlength=len(branchlist)).astype(int).tolist()
+        faces = count((rings-1)*sides) if facebool else [0]*len(branchlist)
+        self.stats['levels'] = [list(row) for row in zip(count(None), count(rings*sides), faces)]
+    
+    def total(self):
+        return sum(self.stats['stages'].values())
 
 if __name__ == "__main__":
-    spine = [Vector((0.0, 0.0, 0.0)), Vector((-0.04053265228867531, 0.1525326669216156, 0.5666670203208923)), Vector((-0.05233679339289665, 0.2162090241909027, 1.1513268947601318)), Vector((0.08932508528232574, 0.07073953002691269, 1.7034058570861816)), Vector((0.3351735472679138, -0.1757250726222992, 2.1775729656219482)), Vector((0.603615939617157, -0.4416947364807129, 2.628371238708496)), Vector((0.9189794659614563, -0.7344887852668762, 3.0294179916381836)), Vector((1.2864696979522705, -1.0440350770950317, 3.3687584400177)), Vector((1.5507733821868896, -1.3234150409698486, 3.813856601715088)), Vector((1.4413506984710693, -1.4571164846420288, 4.376147747039795)), Vector((1.1136771440505981, -1.5123927593231201, 4.861530303955078)), Vector((0.7895124554634094, -1.5705634355545044, 5.3489251136779785)), Vector((0.40334513783454895, -1.6063776016235352, 5.791208267211914)), Vector((-0.05430370569229126, -1.612501621246338, 6.160719394683838)), Vector((-0.49577754735946655, -1.616670846939087, 6.549442768096924)), Vector((-0.767345666885376, -1.5683027505874634, 7.068993091583252)), Vector((-0.6747534275054932, -1.3740949630737305, 7.616468906402588)), Vector((-0.3822815418243408, -1.097188115119934, 8.04518985748291))]
-    mp = [0, 10, 0.44, 0.01*0.44, 1.0, 10/30]
-    brp = [2, math.pi*30/180, math.pi*60/180,0.3, 0.1, 0.3, 1]
-    scale_lf1 = lambda x, a : 1/((x+1)**a)-(x/2)**a #this one is for trunk flare
-    scale_lf2 = lambda x, a : ((1-(x-1)**2)/(a*(x-1)+1))**0.5  #this one is for branches scale
-    tp = [scale_lf1, 1.0, scale_lf2, 0.7]
-    print(guides_gen(spine, 1, mp, brp, tp))
\ No newline at end of file
+    start = time.time()
+    verts, edges, faces, selection, info = generate(treeparams())
+    print(len(verts), 'vertices,', len(faces), 'faces,', len(info), 'branches in', round(time.time()-start, 3), 's')
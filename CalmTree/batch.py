@@ -0,0 +1,96 @@
+'''
+headless batch generation, no Blender needed
+
+    python -m CalmTree.batch params.json --seeds 1-500 --out trees
+
+params.json holds tree settings by their panel names (see algorithm.DEFAULTS), anything
+missing keeps its default. Every seed in the ranges gives one tree, the seed is written into
+all of the --vary settings. Each tree is written as name.obj (mesh) and name.npz (skeleton),
+and one line of stats.csv. Trees are spread over all cores unless --workers says otherwise,
+with fewer trees than workers the branches of each tree are spread over them instead.
+'''
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+import numpy as np
+from .algorithm import *
+
+STATS = ['name', 'seed', 'vertices', 'faces', 'branches', 'levels', 'seconds']
+
+# '1-10,20,30-32' -> [1..10, 20, 30, 31, 32]
+def seedrange(text):
+    seeds = []
+    for part in text.split(','):
+        lo, _, hi = part.partition('-')
+        seeds.extend(range(int(lo), int(hi or lo)+1))
+    return seeds
+
+# mesh as a wavefront obj, indices start at 1
+def writeobj(path, verts, edges, faces):
+    with open(path, 'w') as f:
+        f.write('v %.6f %.6f %.6f\n'*len(verts) % tuple(verts.ravel().tolist()))
+        f.write('f %d %d %d %d\n'*len(faces) % tuple((faces+1).ravel().tolist()))
+        f.write('l %d %d\n'*len(edges) % tuple((edges+1).ravel().tolist()))
+
+# skeleton of the tree as algorithm.skeleton packs it, branch i is points[start[i]:start[i+1]]
+# everything measured in length takes the scale of the mesh
+def writeskeleton(path, branchlist, scale, info=()):
+    skel = skeleton(branchlist, info)
+    for name in ('points', 'length', 'radius', 'tipradius', 'segment'):
+        skel[name] = skel[name]*skel[name].dtype.type(scale)
+    np.savez_compressed(path, **skel)
+
+# one tree, runs in a worker process and only sends the stats back
+# with a pool it runs here and the guides of every level are placed in the pool's workers
+def batchtree(job, pool=None):
+    name, seed, props, out = job
+    start = time.time()
+    tps = treeparams(**props)
+    branchlist, (m_p, br_p, bn_p, bd_p, r_p, t_p, e_p) = growtree(tps, pool=pool)
+    levels = len(branchlist)
+    verts, edges, faces, selection, info = toverts(branchlist, tps.facebool, m_p, br_p, t_p, e_p)
+    writeskeleton(os.path.join(out, name+'.npz'), branchlist, m_p[4], info)
+    writeobj(os.path.join(out, name+'.obj'), verts, edges, faces)
+    return {'name': name, 'seed': seed, 'vertices': len(verts), 'faces': len(faces),
+            'branches': len(info) or sum(len(level) for level in branchlist), 'levels': levels,
+            'seconds': round(time.time()-start, 3)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m CalmTree.batch', description='generate many trees without Blender')
+    parser.add_argument('params', help='json file with tree settings, missing ones keep their defaults')
+    parser.add_argument('--seeds', type=seedrange, default=[1], help='seed ranges like 1-100,200-210')
+    parser.add_argument('--vary', default='branch_seed,bends_seed,Rperlin_seed', help='settings that take the seed')
+    parser.add_argument('--out', default='trees', help='output directory')
+    parser.add_argument('--prefix', default='tree', help='file name prefix')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes, all cores by default')
+    args = parser.parse_args(argv)
+
+    with open(args.params) as f:
+        props = json.load(f)
+    vary = [name for name in args.vary.split(',') if name]
+    treeparams(**{**props, **{name: 0 for name in vary}}) #fails early on unknown settings
+    os.makedirs(args.out, exist_ok=True)
+    jobs = [('%s_%05d' % (args.prefix, seed), seed, {**props, **{name: seed for name in vary}}, args.out) for seed in args.seeds]
+
+    start = time.time()
+    with open(os.path.join(args.out, 'stats.csv'), 'w', newline='') as f, Pool(args.workers) as pool:
+        writer = csv.DictWriter(f, STATS)
+        writer.writeheader()
+        if len(jobs) < args.workers:
+            results = (batchtree(job, pool) for job in jobs) #too few trees for the workers, each tree is spread over them
+        else:
+            results = pool.imap_unordered(batchtree, jobs)
+        for done, stats in enumerate(results, 1):
+            writer.writerow(stats)
+            rate = done/(time.time()-start)*60
+            print('[%d/%d] %s %d verts %.2fs, %.1f trees/min' % (done, len(jobs), stats['name'], stats['vertices'], stats['seconds'], rate))
+    elapsed = time.time()-start
+    print('%d trees in %.1fs, %.1f trees/min with %d workers' % (len(jobs), elapsed, len(jobs)/elapsed*60, args.workers))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+'''
+micro-benchmarks of the generation pipeline, no Blender needed
+
+    python -m CalmTree.bench               run and compare with the stored baseline
+    python -m CalmTree.bench --save        run and store the results as the new baseline, in bench_baseline.json
+                                           of the working directory unless --baseline says otherwise
+    python -m CalmTree.bench -k bark       only the cases with "bark" in their name
+
+Every case runs over a sweep of Mvres, Msides, branch levels or densities, so the table
+doubles as a scaling curve. Cases slower than the baseline by more than --tolerance are
+flagged and the exit code is 1, so it can guard against regressions in CI. Slowdowns smaller
+than --floor seconds are timer noise and never flagged.
+'''
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+from .algorithm import *
+
+# timings only compare on the machine they were taken on, so the baseline lives in the working directory
+# and not in the add-on
+BASELINE = 'bench_baseline.json'
+
+SWEEPS = {
+    'Mvres': (15, 30, 60, 120, 240),
+    'Msides': (6, 10, 20, 40),
+    'branch_levels': (1, 2, 3),
+    'density': (0.5, 1.0, 2.0, 4.0),
+    'slider': ('Mscale', 'Msides', 'interp', 'branch_number2', 'branch_seed', 'bends_amount'),
+}
+
+# two values every slider case switches between
+SLIDER = {'Mscale': (1.0, 1.5), 'Msides': (10, 12), 'interp': (0, 1), 'branch_number2': (1.0, 1.5),
+          'branch_seed': (1, 2), 'bends_amount': (0.2, 0.3)}
+
+# best time of one call in seconds, repeats are sized so that every one takes about 20ms
+def timeit(fn, repeat=5):
+    start = time.perf_counter()
+    fn()
+    once = time.perf_counter()-start
+    number = max(1, int(0.02/max(once, 1e-9)))
+    best = once
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            fn()
+        best = min(best, (time.perf_counter()-start)/number)
+    return best
+
+# a level of children grown from the trunk of a default tree, as the padded arrays grow() uses
+def spinebatch(vres):
+    branchlist, (m_p, br_p, bn_p, bd_p, r_p, t_p, e_p) = growtree(treeparams(Mvres=vres, branch_levels=1, branch_number1=2))
+    trunk, level = branchlist
+    guide = guides(trunk.guidesjob(0, bn_p[0], br_p, t_p, e_p[1], e_p[2]))[1]
+    n = np.diff(level.start)
+    l, length, radius = level.segment, level.length, level.radius
+    seeds = level.seeds(bd_p, r_p)
+    spines = spine_grow(guide, n, l, bd_p, seeds[0])
+    return locals()
+
+# bark_gen arguments for all branches of a tree
+def barkargs(branchlist, t_p):
+    flat = flattened(branchlist)
+    return flat['spine'], np.diff(flat['start']), flat['sides'], flat['radius'], flat['tipradius'], t_p
+
+# cases as (name, sweep, value, function), setup happens here and is not timed
+def cases():
+    for vres in SWEEPS['Mvres']:
+        b = spinebatch(vres)
+        # one step halfway up the spines, for all the branches that reach it as spine_grow does
+        k = max(3, int(np.median(b['n']))//2+1)
+        act = np.nonzero(b['n'] >= k)[0]
+        bend = bend_noise(b['seeds'][0], k-1, b['l'], b['bd_p'])[act, k-2]
+        old_vec = b['spines'][act, k-2]-b['spines'][act, k-3]
+        yield 'spine_bend', 'Mvres', vres, lambda b=b, k=k, act=act, bend=bend, old_vec=old_vec: spine_bend(old_vec, k, b['n'][act], b['bd_p'], b['guide'][act], bend)
+        yield 'spine_jiggle', 'Mvres', vres, lambda b=b: spine_jiggle(b['spines'], b['n'], b['l'], b['length'], b['r_p'], b['seeds'][1])
+        yield 'spine_weight', 'Mvres', vres, lambda b=b: spine_weight(b['spines'], b['n'], b['l'], b['radius'], False, b['bd_p'])
+
+        trunk, br_p, t_p = b['trunk'], b['br_p'], b['t_p']
+        spine, mp = trunk.points(0), trunk.mp(0)
+        for qual in (1, 4, 10):
+            yield 'guides_gen[qual=%d]' % qual, 'Mvres', vres, lambda spine=spine, mp=mp, br_p=br_p, qual=qual: guides_gen(spine, 1/1.2, mp, br_p, t_p, qual)
+        yield 'fastguides_gen', 'Mvres', vres, lambda spine=spine, mp=mp, br_p=br_p: fastguides_gen(spine, 60, mp, br_p, t_p)
+        yield 'bark_gen', 'Mvres', vres, lambda args=barkargs(b['branchlist'], t_p): bark_gen(*args)
+        yield 'interpolate', 'Mvres', vres, lambda spine=spine: interpolated(spine, np.array([len(spine)]), 2)
+
+    for sides in SWEEPS['Msides']:
+        tps = treeparams(Msides=sides)
+        branchlist, (m_p, br_p, bn_p, bd_p, r_p, t_p, e_p) = growtree(tps)
+        yield 'bark_gen', 'Msides', sides, lambda args=barkargs(branchlist, t_p): bark_gen(*args)
+        yield 'face_gen', 'Msides', sides, lambda sides=sides: face_template.__wrapped__(sides, 30)+np.int32(0) #without the template cache
+        yield 'toverts', 'Msides', sides, lambda branchlist=branchlist, m_p=m_p, br_p=br_p, t_p=t_p, e_p=e_p: toverts(branchlist, True, m_p, br_p, t_p, e_p)
+
+    for levels in SWEEPS['branch_levels']:
+        tps = treeparams(branch_levels=levels)
+        branchlist, (m_p, br_p, bn_p, bd_p, r_p, t_p, e_p) = growtree(tps)
+        yield 'toverts', 'branch_levels', levels, lambda branchlist=branchlist, m_p=m_p, br_p=br_p, t_p=t_p, e_p=e_p: toverts(branchlist, True, m_p, br_p, t_p, e_p)
+        yield 'generate', 'branch_levels', levels, lambda tps=tps: generate(tps)
+        yield 'generate[fast]', 'branch_levels', levels, lambda levels=levels: generate(treeparams(branch_levels=levels, poisson_type='fast'))
+
+    for density in SWEEPS['density']:
+        b = spinebatch(30)
+        spine, mp, br_p, t_p = b['trunk'].points(0), b['trunk'].mp(0), b['br_p'], b['t_p']
+        num = lambda d, l: ceil((2.2*l+11)*d**(1.37*l**0.1))
+        yield 'guides_gen[qual=4]', 'density', density, lambda spine=spine, mp=mp, br_p=br_p, density=density: guides_gen(spine, 1/density, mp, br_p, t_p, 4)
+        yield 'fastguides_gen', 'density', density, lambda spine=spine, mp=mp, br_p=br_p, density=density: fastguides_gen(spine, num(density, mp[1]), mp, br_p, t_p)
+        yield 'generate', 'density', density, lambda density=density: generate(treeparams(branch_number1=density, branch_number2=density))
+
+    for name in SWEEPS['slider']:
+        cache = treecache()
+        cache.generate(treeparams())
+        def edit(cache=cache, name=name, flip=[0]):
+            flip[0] ^= 1
+            cache.generate(treeparams(**{name: SLIDER[name][flip[0]]}))
+        yield 'treecache edit', 'slider', name, edit
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m CalmTree.bench', description='micro-benchmarks of the generation pipeline')
+    parser.add_argument('-k', default='', help='only run cases whose name contains this')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline json file')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a case is flagged')
+    parser.add_argument('--floor', type=float, default=5e-5, help='slowdowns under this many seconds are noise and never flagged')
+    parser.add_argument('--repeat', type=int, default=5, help='repeats per case, the best one counts')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    regressions = []
+    print('%-40s %12s %12s %8s' % ('case', 'seconds', 'baseline', 'ratio'))
+    for name, sweep, value, fn in cases():
+        key = '%s %s=%s' % (name, sweep, value)
+        if args.k not in key:
+            continue
+        results[key] = timeit(fn, args.repeat)
+        old = baseline.get(key)
+        ratio = results[key]/old if old else None
+        flag = ''
+        if ratio is not None and ratio > 1+args.tolerance and results[key]-old > args.floor:
+            regressions.append(key)
+            flag = '  SLOWER'
+        print('%-40s %12.6f %12s %8s%s' % (key, results[key], '%.6f' % old if old else '-', '%.2f' % ratio if ratio else '-', flag))
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                       'results': {**baseline, **results}}, f, indent=1, sort_keys=True)
+        print('baseline saved to', args.baseline)
+    if not baseline and not args.save:
+        print('no baseline at %s, run with --save to store one' % args.baseline)
+    if regressions:
+        print('%d of %d cases slower than the baseline by more than %d%%' % (len(regressions), len(results), args.tolerance*100))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,52 +1,158 @@
 import bpy
-import bmesh
 import os
+import json
+import time
+import numpy as np
+from mathutils import Vector
 from .geogroup import *
 from .algorithm import *
+from .profiling import *
+from .worker import treejob
 from .leafmat import *
 from .barkmat import *
 
 
 def checkedit(context):
-    config = context.object["CalmTreeConfig"]
-    for i in config.split(','):
-        if 'edit' in i:
-            if 'True' in i:
-                return True
-            if 'False' in i:
-                return False
+    settings = loadconfig(context.object["CalmTreeConfig"])
+    edit = None if settings is None else settings.get('edit')
+    if edit is not None:
+        return CONFIG_TYPES['BOOLEAN'](edit)
 
 
-def parameters():
-    tps = bpy.data.window_managers["WinMan"].calmtree_props
+CONFIG_VERSION = 1
+# bookkeeping of the property group that is not a setting of the tree
+CONFIG_SKIP = {'rna_type', 'name', 'ops_complete', 'treename'}
+# stored values to property values by property type, older configs hold everything as text
+CONFIG_TYPES = {
+    'BOOLEAN': lambda value: value in (True, 1, 'True'),
+    'INT': int,
+    'FLOAT': float,
+    'ENUM': str,
+    'STRING': str,
+}
+
 
-    # temporary parameters
-    def scale_lf1(x, a): return 1/((x+1)**a) - \
-        (x/2)**a  # this one is for trunk flare
-    def scale_lf2(x, a): return (4*x*(1-x)*((1-a**2)**0.5+1)/(2*(a*(2*x-1)+1))
-                                 )**(0.5+0.5*abs(a))  # this one is for branches scale
-
-    l = tps.Mlength/tps.Mvres
-    m_p = [tps.Msides, tps.Mlength, tps.Mradius, tps.Mtipradius, tps.Mscale, l]
-    br_p = [tps.branch_levels, tps.branch_minangle, tps.branch_maxangle, tps.branch_height,
-            tps.branch_horizontal, tps.branch_variety, tps.branch_scaling, tps.branch_seed]
-    bn_p = [tps.branch_number1, tps.branch_number2, tps.branch_number3]
-    bd_p = [tps.bends_amount, tps.bends_up, tps.bends_correction,
-            tps.bends_scale, tps.bends_weight/(tps.Mlength), tps.bends_seed]
-    t_p = [scale_lf1, tps.flare_amount, scale_lf2, tps.branch_shift]
-    r_p = [tps.Rperlin_amount, tps.Rperlin_scale, tps.Rperlin_seed]
-    e_p = [tps.interp, tps.poisson_type, tps.poisson_qual]
-    return m_p, br_p, bn_p, bd_p, r_p, t_p, e_p
+def configkeys(tps):
+    return [prop.identifier for prop in tps.bl_rna.properties if prop.identifier not in CONFIG_SKIP]
 
 
 def saveconfig():
+    # panel settings of the tree as a typed property group, with the version of its layout
     tps = bpy.data.window_managers["WinMan"].calmtree_props
-    config = ''
-    excluded = ['__', 'rna', 'sync']
-    for new in dir(tps):
-        if not any(x in new for x in excluded):
-            config += new + '=' + str(getattr(tps, new)) + ','
-    return config
+    return {'version': CONFIG_VERSION, 'settings': {key: getattr(tps, key) for key in configkeys(tps)}}
+
+
+def loadconfig(config):
+    # stored settings by name, configs of older versions are a 'name=value,' string
+    # None for a config of another version, its layout can't be trusted to match the panel
+    if isinstance(config, str):
+        return dict(item.split('=', 1) for item in config.split(',') if '=' in item)
+    if config.get('version') != CONFIG_VERSION:
+        return None
+    return config['settings'].to_dict()
+
+
+def meshwrite(mesh, verts, edges, faces):
+    # fills an empty mesh straight from the flat buffers toverts returns
+    verts = np.asarray(verts, dtype=np.float32).reshape(-1, 3)
+    edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+    faces = np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set('co', verts.ravel())
+    if len(edges):
+        mesh.edges.add(len(edges))
+        mesh.edges.foreach_set('vertices', edges.ravel())
+    if len(faces):
+        mesh.loops.add(faces.size)
+        mesh.loops.foreach_set('vertex_index', faces.ravel())
+        mesh.polygons.add(len(faces))
+        mesh.polygons.foreach_set('loop_start', np.arange(0, faces.size, 4, dtype=np.int32))
+        mesh.polygons.foreach_set('loop_total', np.full(len(faces), 4, dtype=np.int32))
+        mesh.polygons.foreach_set('use_smooth', np.ones(len(faces), dtype=bool))
+    mesh.update(calc_edges=True)
+
+
+def sametopology(mesh, verts, edges, faces):
+    # true if the mesh already holds exactly these edges and quads, so only coordinates changed
+    if len(mesh.vertices) != len(verts) or len(mesh.polygons) != len(faces):
+        return False
+    if len(faces):
+        if len(mesh.loops) != faces.size:
+            return False
+        loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get('loop_start', loop_start)
+        loops = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get('vertex_index', loops)
+        return np.array_equal(loop_start, np.arange(0, faces.size, 4)) and np.array_equal(loops, faces.ravel())
+    if len(mesh.edges) != len(edges):
+        return False
+    mesh_edges = np.empty(len(mesh.edges)*2, dtype=np.int32)
+    mesh.edges.foreach_get('vertices', mesh_edges)
+    return np.array_equal(mesh_edges, edges.ravel())
+
+
+# grown stages of the tree edited last, slider edits on it only recompute the stages they feed
+# previews have a cache of their own so they don't throw away the full quality one
+caches = {}
+
+
+def keepcache(obj, cache):
+    caches.clear()
+    caches[(obj.name, False)] = cache
+
+
+def cacheof(obj, preview):
+    if any(name != obj.name for name, p in caches):
+        caches.clear()
+    if (obj.name, preview) not in caches:
+        caches[(obj.name, preview)] = treecache() if preview else restoredcache(obj)
+    return caches[(obj.name, preview)]
+
+
+def saveskeleton(obj, skeleton):
+    # grown levels stored on the tree as flat arrays, so a reopened file does not grow it again
+    obj["CalmTreeSkeleton"] = {name: np.ascontiguousarray(value).ravel() if isinstance(value, np.ndarray) else value
+                               for name, value in skeleton.items()}
+
+
+def restoredcache(obj):
+    # cache of a tree from an earlier session, skeletons of another version are grown again
+    skeleton = obj.get("CalmTreeSkeleton")
+    if skeleton is not None:
+        try:
+            return treecache().restore({name: value if isinstance(value, (str, int)) else np.asarray(value)
+                                        for name, value in skeleton.items()})
+        except (KeyError, ValueError, TypeError):
+            pass
+    return treecache()
+
+
+def profilable(cls):
+    # runs the operator under cProfile when the next generation was asked to be profiled,
+    # previews while a slider is dragged and restores are left out so the profile is of a full generation
+    execute = cls.execute
+
+    def profiled(self, context):
+        wm = context.window_manager
+        if not wm.calmtree_profile or getattr(self, 'preview', False) or getattr(self, 'restore', False):
+            return execute(self, context)
+        wm.calmtree_profile = False
+        directory = os.path.dirname(bpy.data.filepath) or bpy.app.tempdir
+        base = os.path.join(directory, 'calmtree_%s_%s' % (
+            cls.bl_idname.split('_')[-1], time.strftime('%Y%m%d_%H%M%S')))
+        result, stats = profilecall(lambda: execute(self, context), base)
+        top = topfunctions(stats, 10)
+        print('CalmTree profile of', cls.bl_idname, 'saved to', base+'.pstats')
+        for tt, ct, nc, name in top:
+            print('%10.1f ms self %10.1f ms total %8d calls  %s' % (tt*1000, ct*1000, nc, name))
+        for tt, ct, nc, name in top[:5]:
+            self.report({'INFO'}, '%.1f ms in %s' % (tt*1000, name))
+        self.report({'INFO'}, 'profile saved to '+base+'.pstats and .collapsed.txt')
+        return result
+
+    cls.execute = profiled
+    return cls
 
 
 def geonode():
@@ -63,6 +169,7 @@ def geonode():
     bpy.context.object.modifiers["CalmTree"]["Input_1_attribute_name"] = "leaves"
 
 
+@profilable
 class CALMTREE_OT_new(bpy.types.Operator):
     """creates a tree at (0,0,0) according to user panel input"""
     bl_idname = 'object.tree_create'
@@ -72,61 +179,107 @@ class CALMTREE_OT_new(bpy.types.Operator):
     def execute(self, context):
         tps = context.window_manager.calmtree_props
 
-        m_p, br_p, bn_p, bd_p, r_p, t_p, e_p = parameters()
-        seeds = [br_p[-1], bd_p[-1], r_p[-1]]
-
-        # generates the trunk and lists of lists of branches
-
-        # m_p[3]*=m_p[2]
-        st_pack = (Vector((0, 0, 0)), Vector((0, 0, 1))*m_p[1], m_p[2])
-        branchlist = [[branch(st_pack, m_p, bd_p, br_p, r_p, True).generate()]]
-        branchlist = outgrow(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p)
-        verts, edges, faces, selection, info = toverts(
-            branchlist, tps.facebool, m_p, br_p, t_p, e_p)
+        # generates the tree
+        timer = stagetimer()
+        cache = treecache()
+        verts, edges, faces, selection, info = cache.generate(tps, timer=timer)
 
         # creating the tree
         mesh = bpy.data.meshes.new("tree")
         object = bpy.data.objects.new("tree", mesh)
         bpy.context.collection.objects.link(object)
-        mesh.from_pydata(verts, edges, faces)
+        meshwrite(mesh, verts, edges, faces)
+        keepcache(object, cache)
 
         # name of the created object and selecting it
         bpy.ops.object.select_all(action='DESELECT')
         object.select_set(True)
         bpy.context.view_layer.objects.active = object
-        bpy.ops.object.shade_smooth()
         object.matrix_world.translation = context.scene.cursor.location
 
         # adding vertex group for furthest branches
         if selection:
             v_group = object.vertex_groups.new(name="leaves")
             v_group.add(selection, 1.0, 'ADD')
+        timer.lap('mesh write')
 
         # adding geometry nodes for leaves
 
         # writing properties
         tps.treename = context.object.name
-        br_p[-1], bd_p[-1], r_p[-1] = seeds
         context.object["CalmTreeConfig"] = saveconfig()
-        context.object["CalmTreeLog"] = info
+        context.object["CalmTreeLog"] = packlog(info)
+        saveskeleton(context.object, cache.skeleton())
 
         if tps.leafbool:
             geonode()
             bpy.ops.object.tree_leaf()
             context.object.modifiers["CalmTree"].show_viewport = False
             context.object.modifiers["CalmTree"].show_viewport = True
+            timer.lap('leaves')
         if tps.matbool:
             bpy.ops.object.tree_mat()
+            timer.lap('materials')
+        object["CalmTreeStats"] = json.dumps(timer.stats)
 
         return {'FINISHED'}
 
 
+# the tree's custom trunk as an (n, 3) array running from the root up, None if it has none
+# and False if there are several to choose from
+def customtrunk(tree_obj):
+    custom_child = [
+        o for o in tree_obj.children if 'custom trunk' in o.name]
+    if len(custom_child) > 1:
+        return False
+    if not custom_child:
+        return None
+    vertices = custom_child[0].data.vertices
+    curve = np.empty(len(vertices)*3)
+    vertices.foreach_get('co', curve)
+    curve = curve.reshape(-1, 3)
+    if np.linalg.norm(curve[-1]) < np.linalg.norm(curve[0]):
+        curve = curve[::-1]
+    return curve
+
+
+# writes generated buffers into the tree's mesh, only coordinates if the topology did not change
+def writetree(tree_obj, buffers, timer):
+    verts, edges, faces, selection, info = buffers
+    mesh = tree_obj.data
+    if sametopology(mesh, verts, edges, faces):
+        mesh.vertices.foreach_set('co', verts.ravel())
+        mesh.update()
+    else:
+        mesh.clear_geometry()
+        meshwrite(mesh, verts, edges, faces)
+
+    v_group = tree_obj.vertex_groups['leaves']
+    v_group.remove([i for i in range(len(verts))])
+    v_group.add(selection, 1.0, 'REPLACE')
+    timer.lap('mesh write')
+
+
+@profilable
 class CALMTREE_OT_update(bpy.types.Operator):
     """updates the tree according to user panel input"""
     bl_idname = 'object.tree_update'
     bl_label = 'update the tree object'
     bl_options = {'REGISTER', 'UNDO'}
 
+    preview: bpy.props.BoolProperty(
+        name='Preview',
+        description='Coarse and quick update, used while a slider is dragged',
+        default=False,
+        options={'SKIP_SAVE'},
+    )
+    restore: bpy.props.BoolProperty(
+        name='Restore',
+        description='Rewrites the full quality tree stored on the object, used to take back a preview',
+        default=False,
+        options={'SKIP_SAVE'},
+    )
+
     def execute(self, context):
         tps = context.window_manager.calmtree_props
         try:
@@ -136,31 +289,21 @@ class CALMTREE_OT_update(bpy.types.Operator):
             return {'FINISHED'}
 
         tree_obj = bpy.context.object
-        custom_child = [
-            o for o in tree_obj.children if 'custom trunk' in o.name]
+        timer = stagetimer()
+
+        # the mesh grown again from the stored skeleton, so it matches the stored settings and log
+        if self.restore:
+            cache = restoredcache(tree_obj)
+            if cache.settings is not None:
+                writetree(tree_obj, cache.generate(treeparams(**cache.settings), cache.curve, timer=timer), timer)
+                return {'FINISHED'}
 
-        if len(custom_child) > 1:
+        curve = customtrunk(tree_obj)
+        if curve is False:
             self.report(
                 {"INFO"}, "I detected multiple viable trunks in the trees children, leave only one")
             return {'FINISHED'}
 
-        branchlist = []
-        m_p, br_p, bn_p, bd_p, r_p, t_p, e_p = parameters()
-        seeds = [br_p[-1], bd_p[-1], r_p[-1]]
-
-        if custom_child:
-            pre_curve = [Vector(v.co) for v in custom_child[0].data.vertices]
-            curve = pre_curve.copy()
-            if curve[-1].length < curve[0].length:
-                curve.reverse()
-            # m_p[3]*=m_p[2]
-            branchlist = branchinit(curve, m_p, bd_p, br_p, r_p)
-        else:
-            # m_p[3]*=m_p[2]
-            st_pack = (Vector((0, 0, 0)), Vector((0, 0, 1))*m_p[1], m_p[2])
-            branchlist = [
-                [branch(st_pack, m_p, bd_p, br_p, r_p, True).generate()]]
-
         '''
         # now this is just a temporary trick until blender fixes something
         if tps.treename != context.object.name:
@@ -168,33 +311,167 @@ class CALMTREE_OT_update(bpy.types.Operator):
             tps.treename = context.object.name
         '''
 
-        # generates the trunk and lists of lists of branches
-        branchlist = outgrow(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p)
-        verts, edges, faces, selection, info = toverts(
-            branchlist, tps.facebool, m_p, br_p, t_p, e_p)
-        # updating mesh, tree update is a temporary object
-        t_mesh = bpy.data.meshes.new('tree update')
-        t_mesh.from_pydata(verts, edges, faces)
+        # generates the tree, from the custom trunk if there is one
+        settings = previewparams(tps, curve is not None) if self.preview else tps
+        cache = cacheof(tree_obj, self.preview)
+        buffers = cache.generate(settings, curve, timer=timer)
+        writetree(tree_obj, buffers, timer)
 
-        bm = bmesh.new()
-        bm.from_mesh(t_mesh)
+        if self.preview:
+            return {'FINISHED'}
+        context.object["CalmTreeConfig"] = saveconfig()
+        context.object["CalmTreeLog"] = packlog(buffers[4])
+        saveskeleton(context.object, cache.skeleton())
+        context.object["CalmTreeStats"] = json.dumps(timer.stats)
 
-        bm.to_mesh(tree_obj.data)
-        bm.free()
-        bpy.data.meshes.remove(t_mesh)
-        for f in tree_obj.data.polygons:
-            f.use_smooth = True
+        return {'FINISHED'}
 
-        v_group = bpy.context.object.vertex_groups['leaves']
-        v_group.remove([i for i in range(len(verts))])
-        v_group.add(selection, 1.0, 'REPLACE')
 
-        br_p[-1], bd_p[-1], r_p[-1] = seeds
-        context.object["CalmTreeConfig"] = saveconfig()
-        context.object["CalmTreeLog"] = info
+class CALMTREE_OT_update_modal(bpy.types.Operator):
+    """updates the tree in small steps, keeping Blender responsive, ESC cancels"""
+    bl_idname = 'object.tree_update_modal'
+    bl_label = 'update the tree in the background'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    budget = 0.05  # seconds of generation per timer tick
+
+    def invoke(self, context, event):
+        try:
+            context.object["CalmTreeConfig"]
+        except:
+            self.report({"INFO"}, "I can't update an object that isn't a tree")
+            return {'CANCELLED'}
+
+        self.tree_name = context.object.name
+        curve = customtrunk(context.object)
+        if curve is False:
+            self.report(
+                {"INFO"}, "I detected multiple viable trunks in the trees children, leave only one")
+            return {'CANCELLED'}
+
+        # the cache only takes the result once the last step is done, so cancelling leaves it as it was
+        # the steps run on a snapshot of the settings, panel edits made meanwhile are left for the next update
+        tps = context.window_manager.calmtree_props
+        self.config = saveconfig()
+        self.timer = stagetimer()
+        self.cache = cacheof(context.object, False)
+        self.steps = self.cache.steps(treeparams(**{name: getattr(tps, name) for name in DEFAULTS}), curve, timer=self.timer)
+        wm = context.window_manager
+        self.event_timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, 100)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.finish(context)
+            self.steps.close()
+            self.report({"INFO"}, "tree update cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        tree_obj = bpy.data.objects.get(self.tree_name)
+        if tree_obj is None:
+            self.finish(context)
+            self.steps.close()
+            return {'CANCELLED'}
+
+        end = time.monotonic()+self.budget
+        try:
+            while time.monotonic() < end:
+                fraction, stage = next(self.steps)
+        except StopIteration as done:
+            self.finish(context)
+            writetree(tree_obj, done.value, self.timer)
+            tree_obj["CalmTreeConfig"] = self.config
+            tree_obj["CalmTreeLog"] = packlog(done.value[4])
+            saveskeleton(tree_obj, self.cache.skeleton())
+            tree_obj["CalmTreeStats"] = json.dumps(self.timer.stats)
+            return {'FINISHED'}
 
+        context.window_manager.progress_update(int(fraction*100))
+        context.workspace.status_text_set("CalmTree: %s, %d%% (ESC to cancel)" % (stage, fraction*100))
+        return {'RUNNING_MODAL'}
+
+    def finish(self, context):
+        context.window_manager.event_timer_remove(self.event_timer)
+        context.window_manager.progress_end()
+        context.workspace.status_text_set(None)
+
+
+class CALMTREE_OT_update_worker(bpy.types.Operator):
+    """updates the tree in a separate process, Blender stays usable while it runs, ESC cancels"""
+    bl_idname = 'object.tree_update_worker'
+    bl_label = 'update the tree in a worker process'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def invoke(self, context, event):
+        try:
+            context.object["CalmTreeConfig"]
+        except:
+            self.report({"INFO"}, "I can't update an object that isn't a tree")
+            return {'CANCELLED'}
+
+        self.tree_name = context.object.name
+        curve = customtrunk(context.object)
+        if curve is False:
+            self.report(
+                {"INFO"}, "I detected multiple viable trunks in the trees children, leave only one")
+            return {'CANCELLED'}
+
+        # the worker gets a snapshot of the settings, the same one is saved with the mesh it returns
+        tps = context.window_manager.calmtree_props
+        self.config = saveconfig()
+        self.timer = stagetimer()
+        self.job = treejob({name: getattr(tps, name) for name in DEFAULTS}, curve)
+        wm = context.window_manager
+        self.event_timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        context.workspace.status_text_set("CalmTree: generating in a worker process (ESC to cancel)")
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.finish(context)
+            self.report({"INFO"}, "tree update cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            result = self.job.poll()
+        except RuntimeError as error:
+            self.finish(context)
+            self.report({"ERROR"}, "tree generation failed: %s" % error)
+            return {'CANCELLED'}
+        if result is None:
+            return {'RUNNING_MODAL'}
+
+        tree_obj = bpy.data.objects.get(self.tree_name)
+        if tree_obj is None:
+            del result
+            self.finish(context)
+            return {'CANCELLED'}
+        self.timer.lap('worker')
+        (verts, edges, faces, selection, info), skeleton = result
+        del result
+        # straight from the shared blocks into the mesh, the selection list is copied out first
+        writetree(tree_obj, (verts, edges, faces, selection.tolist(), info), self.timer)
+        tree_obj["CalmTreeConfig"] = self.config
+        tree_obj["CalmTreeLog"] = packlog(info)
+        saveskeleton(tree_obj, skeleton)
+        keepcache(tree_obj, treecache().restore(skeleton))
+        tree_obj["CalmTreeStats"] = json.dumps(self.timer.stats)
+        del verts, edges, faces, selection, info, skeleton
+        self.finish(context)
         return {'FINISHED'}
 
+    def finish(self, context):
+        self.job.release()
+        context.window_manager.event_timer_remove(self.event_timer)
+        context.workspace.status_text_set(None)
+
 
 class CALMTREE_OT_draw(bpy.types.Operator):
     """let's the user edit the trunk"""
@@ -217,6 +494,7 @@ class CALMTREE_OT_draw(bpy.types.Operator):
         return {'FINISHED'}
 
 
+@profilable
 class CALMTREE_OT_regrow(bpy.types.Operator):
     """regrows tree from line of points"""
     bl_idname = 'object.tree_regrow'
@@ -245,38 +523,33 @@ class CALMTREE_OT_regrow(bpy.types.Operator):
         bpy.ops.object.mode_set(mode='EDIT')
         bpy.ops.mesh.select_linked(delimit=set())
         bpy.ops.object.mode_set(mode='OBJECT')
-        curve = [v.co for v in obj.data.vertices if v.select]
+        curve = np.array([v.co for v in obj.data.vertices if v.select])
 
-        if curve[-1].length < curve[0].length:
-            curve.reverse()
+        if np.linalg.norm(curve[-1]) < np.linalg.norm(curve[0]):
+            curve = curve[::-1]
 
-        context.scene.cursor.location = curve[0] + curve_obj.location
+        context.scene.cursor.location = Vector(curve[0]) + curve_obj.location
         bpy.ops.object.origin_set(type='ORIGIN_CURSOR')
         curve_obj.location = (0, 0, 0)
 
-        tps.Mlength = sum(
-            [(curve[i+1]-curve[i]).length for i in range(len(curve)-1)])
+        tps.Mlength = float(np.linalg.norm(curve[1:]-curve[:-1], axis=1).sum())
         tps.Mscale = 1
         tps.Mvres = len(curve)
-        m_p, br_p, bn_p, bd_p, r_p, t_p, e_p = parameters()
-        seeds = [br_p[-1], bd_p[-1], r_p[-1]]
 
         # generates the trunk and lists of lists of stuff
-        m_p[3] *= m_p[2]
-        branchlist = branchinit(curve, m_p, bd_p, br_p, r_p)
-        branchlist = outgrow(branchlist, br_p, bn_p, bd_p, r_p, t_p, e_p)
-        verts, edges, faces, selection, info = toverts(
-            branchlist, tps.facebool, m_p, br_p, t_p, e_p)
+        timer = stagetimer()
+        cache = treecache()
+        verts, edges, faces, selection, info = cache.generate(tps, curve, timer=timer)
 
         # creating the tree
         mesh = bpy.data.meshes.new("tree")
         tree = bpy.data.objects.new("tree", mesh)
         bpy.context.collection.objects.link(tree)
-        mesh.from_pydata(verts, edges, faces)
+        meshwrite(mesh, verts, edges, faces)
+        keepcache(tree, cache)
         bpy.ops.object.select_all(action='DESELECT')
         tree.select_set(True)
         bpy.context.view_layer.objects.active = tree
-        bpy.ops.object.shade_smooth()
 
         # renaming and parenting
         curve_obj.parent = tree
@@ -290,13 +563,11 @@ class CALMTREE_OT_regrow(bpy.types.Operator):
                 bpy.data.meshes.remove(m)
         curve_obj.data.name = 'trunk curve'+ext
 
-        # writing properties
-        br_p[-1], bd_p[-1], r_p[-1] = seeds
-
         # adding vertex group for furthest branches
         if selection:
             v_group = tree.vertex_groups.new(name="leaves")
             v_group.add(selection, 1.0, 'ADD')
+        timer.lap('mesh write')
 
         # adding geometry nodes for leaves
         if 'CalmTree_nodegroup' not in bpy.data.node_groups:
@@ -310,14 +581,28 @@ class CALMTREE_OT_regrow(bpy.types.Operator):
         bpy.ops.object.geometry_nodes_input_attribute_toggle(
             prop_path="[\"Input_1_use_attribute\"]", modifier_name="CalmTree")
         bpy.context.object.modifiers["CalmTree"]["Input_1_attribute_name"] = "leaves"
+        timer.lap('leaves')
         tps.treename = context.object.name
 
         context.object["CalmTreeConfig"] = saveconfig()
+        saveskeleton(context.object, cache.skeleton())
+        context.object["CalmTreeStats"] = json.dumps(timer.stats)
         tps.ops_complete = True
 
         return {'FINISHED'}
 
 
+class CALMTREE_OT_profile(bpy.types.Operator):
+    """profiles the next create, update or regrow with cProfile"""
+    bl_idname = 'object.tree_profile'
+    bl_label = 'Profile next update'
+
+    def execute(self, context):
+        context.window_manager.calmtree_profile = True
+        self.report({"INFO"}, "The next create, update or regrow will be profiled")
+        return {'FINISHED'}
+
+
 class CALMTREE_OT_sync(bpy.types.Operator):
     """syncs tps property group with custom properties"""
     bl_idname = 'object.tree_sync'
@@ -331,35 +616,20 @@ class CALMTREE_OT_sync(bpy.types.Operator):
             self.report({"INFO"}, "I can't sync an object that isn't a tree")
             return {'FINISHED'}
 
-        config = context.object["CalmTreeConfig"]
-
+        settings = loadconfig(context.object["CalmTreeConfig"])
+        if settings is None:
+            self.report({"INFO"}, "the tree was made by another version of CalmTree, its settings can't be synced")
+            return {'FINISHED'}
         tps = bpy.data.window_managers["WinMan"].calmtree_props
-        config = [i.split('=') for i in config.split(',')]
-        excluded = ['__', 'rna', 'sync']
+        props = tps.bl_rna.properties
+
+        # only the settings that differ are set, each set runs the property's update
         tps.ops_complete = False
-        for old in dir(tps):
-            if not any(x in old for x in excluded):
-                new = [i for i in config if old in i][0][1]
-                try:
-                    int(new)
-                except:
-                    pass
-                else:
-                    setattr(tps, old, int(new))
-                    continue
-                try:
-                    float(new)
-                except:
-                    pass
-                else:
-                    setattr(tps, old, float(new))
-                    continue
-                if new == 'True':
-                    setattr(tps, old, True)
-                elif new == 'False':
-                    setattr(tps, old, False)
-                else:
-                    setattr(tps, old, new)
+        for key in configkeys(tps):
+            if key in settings:
+                value = CONFIG_TYPES[props[key].type](settings[key])
+                if getattr(tps, key) != value:
+                    setattr(tps, key, value)
         tps.ops_complete = True
 
         return {'FINISHED'}
@@ -375,10 +645,8 @@ class CALMTREE_OT_default(bpy.types.Operator):
         tps = bpy.data.window_managers["WinMan"].calmtree_props
         tps.treename = context.object.name
         tps.ops_complete = False
-        excluded = ['__', 'rna', 'sync']
-        for i in dir(tps):
-            if not any(x in i for x in excluded):
-                tps.property_unset(i)
+        for key in configkeys(tps):
+            tps.property_unset(key)
         tps.ops_complete = True
         bpy.ops.object.tree_update()
         return {'FINISHED'}
@@ -1,36 +1,195 @@
-from math import sin, cos
+from math import sin, cos, floor
 import math
 import random
-from mathutils import Vector, Matrix
+import hashlib
+import numpy as np
 
-def pseudo_poisson_disc(n, length, radius):
+# NOISE
+# gradient noise in the 0-1 range, works on (..., 3) arrays of points at once
+# it stands in for mathutils.noise so the same seed gives the same tree inside and outside of Blender
+_perm = list(range(256))
+random.Random(0).shuffle(_perm)
+_perm = np.array(_perm*2)
+
+def noise(pts):
+    p = np.asarray(pts, dtype=np.float64)
+    cell = np.floor(p)
+    x, y, z = np.moveaxis(p-cell, -1, 0)
+    X, Y, Z = np.moveaxis(cell.astype(np.int64) & 255, -1, 0)
+    fade = lambda t: t*t*t*(t*(t*6-15)+10)
+    lerp = lambda t, a, b: a+t*(b-a)
+    u, v, w = fade(x), fade(y), fade(z)
+
+    def grad(h, x, y, z):
+        h = h & 15
+        a = np.where(h < 8, x, y)
+        b = np.where(h < 4, y, np.where((h == 12) | (h == 14), x, z))
+        return np.where(h & 1, -a, a)+np.where(h & 2, -b, b)
+
+    A, B = _perm[X]+Y, _perm[X+1]+Y
+    AA, AB, BA, BB = _perm[A]+Z, _perm[A+1]+Z, _perm[B]+Z, _perm[B+1]+Z
+    res = lerp(w, lerp(v, lerp(u, grad(_perm[AA], x, y, z), grad(_perm[BA], x-1, y, z)),
+                          lerp(u, grad(_perm[AB], x, y-1, z), grad(_perm[BB], x-1, y-1, z))),
+                  lerp(v, lerp(u, grad(_perm[AA+1], x, y, z-1), grad(_perm[BA+1], x-1, y, z-1)),
+                          lerp(u, grad(_perm[AB+1], x, y-1, z-1), grad(_perm[BB+1], x-1, y-1, z-1))))
+    return 0.5+0.5*res
+
+# 64 bit seed of one branch, path holds the child indices from the trunk down
+# so the same seed and path give the same value in any generation order and in any process
+def branchseed(seed, stream, path):
+    key = '/'.join(map(str, (stream, seed)+tuple(path))).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+# PLACEMENT
+def pseudo_poisson_disc(n, length, radius, rng=random):
     result = []
     for i in range(n):
-        h = random.uniform(0, length/radius)**0.5*(length/radius)**0.5
-        a = (random.uniform(-math.pi,math.pi))
+        h = rng.uniform(0, length/radius)**0.5*(length/radius)**0.5
+        a = (rng.uniform(-math.pi,math.pi))
         result.append((a,h))
     return result
 
-def ptgen(spine, radius, idx, scale_f1, flare, hor):
+# spine is a list of points and frames the rotations from (0,0,1) to each of its segments, both as plain lists
+def ptgen(spine, frames, radius, idx, scale_f1, flare, hor, rng=random):
         pt = spine[idx]
         pt2 = spine[idx+1]
-        x = random.random()
-        origin = x*pt+(1-x)*pt2
+        x = rng.random()
+        origin = tuple(x*a+(1-x)*b for a, b in zip(pt, pt2))
         h = (idx+x)/len(spine)
         radius += scale_f1(h, flare)
-        phi = random.uniform(-math.pi,math.pi)
-        npt = Vector((0,0,1)).rotation_difference(pt2-pt)@Vector((radius*sin(phi), radius*cos(phi),0))
+        phi = rng.uniform(-math.pi,math.pi)
+        a, b = radius*sin(phi), radius*cos(phi)
+        npt = [row[0]*a+row[1]*b for row in frames[idx]]
         if hor > 0.01:
-            npt = (Matrix.Scale(0.0,4,(pt2-pt))@(npt*Vector((1,1,1-hor)))).normalized()
+            #squashing towards the plane of the segment
+            axis = [row[2] for row in frames[idx]]
+            npt[2] *= 1-hor
+            dot = sum(v*ax for v, ax in zip(npt, axis))
+            npt = [v-dot*ax for v, ax in zip(npt, axis)]
+            length = math.sqrt(sum(v*v for v in npt))
+            npt = [v/length for v in npt] if length else npt
         
-        return npt+origin, origin, h
+        return tuple(v+o for v, o in zip(npt, origin)), origin, h
     
-def check(npt, grid, lim, idx, ran):
-    current = [v for lis in grid[max(-ran, -len(grid)):] for v in lis]
-    for p in current:
-        if abs((npt-p).length) < lim:
-            return False
-    return True
+# uniform grid of cells twice as big as the minimal distance, filled as the points get accepted
+# every point remembers the row it was accepted in, so old rows can be left out of the check
+class spatialhash():
+    def __init__(self, lim):
+        self.cell = 2*lim
+        self.cells = {}
+
+    def add(self, pt, row):
+        key = (floor(pt[0]/self.cell), floor(pt[1]/self.cell), floor(pt[2]/self.cell))
+        self.cells.setdefault(key, []).append((row, pt))
+
+    # true if no point accepted in row or later is closer than lim
+    # a sphere of radius lim only reaches the 2x2x2 cells on the side of the half cell npt sits in
+    def check(self, npt, lim, row):
+        near = []
+        for c in (npt[0]/self.cell, npt[1]/self.cell, npt[2]/self.cell):
+            k = floor(c)
+            near.append((k, k+1) if c-k >= 0.5 else (k-1, k))
+        for x in near[0]:
+            for y in near[1]:
+                for z in near[2]:
+                    bucket = self.cells.get((x, y, z))
+                    if not bucket:
+                        continue
+                    stale = 0
+                    while stale < len(bucket) and bucket[stale][0] < row:
+                        stale += 1
+                    del bucket[:stale]
+                    for r, p in bucket:
+                        if math.dist(npt, p) < lim:
+                            return False
+        return True
+
+# batch version of Vector((0,0,1)).rotation_difference(vec), returns (...,3,3) rotation matrices
+def rotations_from_z(vecs):
+    d = np.asarray(vecs, dtype=np.float64)
+    length = np.linalg.norm(d, axis=-1, keepdims=True)
+    d = np.where(length > 0, d/np.where(length > 0, length, 1), (0.0, 0.0, 1.0))
+    x, y, z = d[..., 0], d[..., 1], d[..., 2]
+    flip = 1+z < 1e-9 #pointing straight down, the axis is ambiguous
+    k = 1/np.where(flip, 1, 1+z)
+
+    rot = np.empty(d.shape[:-1]+(3, 3))
+    rot[..., 0, 0] = 1-x*x*k
+    rot[..., 0, 1] = -x*y*k
+    rot[..., 0, 2] = x
+    rot[..., 1, 0] = -x*y*k
+    rot[..., 1, 1] = 1-y*y*k
+    rot[..., 1, 2] = y
+    rot[..., 2, 0] = -x
+    rot[..., 2, 1] = -y
+    rot[..., 2, 2] = z
+    rot[flip] = ((0, 1, 0), (1, 0, 0), (0, 0, -1)) #same half turn mathutils picks
+    return rot
+
+# batch version of Vector.normalized(), zero vectors stay zero
+def normalized(vecs):
+    v = np.asarray(vecs, dtype=np.float64)
+    length = np.linalg.norm(v, axis=-1, keepdims=True)
+    return v/np.where(length > 0, length, 1)
+
+# batch version of a.rotation_difference(b), returns (...,3,3) rotation matrices
+def rotations_between(a, b):
+    a, b = normalized(a), normalized(b)
+    w = np.cross(a, b)
+    c = np.sum(a*b, axis=-1)
+    flip = 1+c < 1e-9 #opposite vectors, the axis is ambiguous
+    k = 1/np.where(flip, 1, 1+c)
+
+    rot = w[..., :, None]*w[..., None, :]*k[..., None, None]
+    rot += c[..., None, None]*np.identity(3)
+    rot[..., 0, 1] -= w[..., 2]
+    rot[..., 0, 2] += w[..., 1]
+    rot[..., 1, 0] += w[..., 2]
+    rot[..., 1, 2] -= w[..., 0]
+    rot[..., 2, 0] -= w[..., 1]
+    rot[..., 2, 1] += w[..., 0]
+    for i in np.argwhere(flip):
+        #half turn around the same orthogonal axis mathutils picks
+        x, y, z = a[tuple(i)]
+        dom = (0 if abs(x) > abs(z) else 2) if abs(x) > abs(y) else (1 if abs(y) > abs(z) else 2)
+        axis = normalized(((-y-z, x, x), (y, -x-z, y), (z, z, -x-y))[dom])
+        rot[tuple(i)] = 2*np.outer(axis, axis)-np.identity(3)
+    return rot
+
+# batch version of Quaternion(axis, angle), axis doesn't need to be normalized, zero axis gives identity
+def axis_angle(axis, angle):
+    axis = np.asarray(axis, dtype=np.float64)
+    length = np.linalg.norm(axis, axis=-1)
+    angle = np.where(length > 0, angle, 0.0)
+    x, y, z = np.moveaxis(axis/np.where(length > 0, length, 1)[..., None], -1, 0)
+    c, s = np.cos(angle), np.sin(angle)
+    t = 1-c
+
+    rot = np.empty(np.shape(c)+(3, 3))
+    rot[..., 0, 0] = c+x*x*t
+    rot[..., 0, 1] = x*y*t-z*s
+    rot[..., 0, 2] = x*z*t+y*s
+    rot[..., 1, 0] = x*y*t+z*s
+    rot[..., 1, 1] = c+y*y*t
+    rot[..., 1, 2] = y*z*t-x*s
+    rot[..., 2, 0] = x*z*t-y*s
+    rot[..., 2, 1] = y*z*t+x*s
+    rot[..., 2, 2] = c+z*z*t
+    return rot
+
+# batch version of Vector((0,0,1)).angle(vec, 0.0)
+def angle_from_z(vecs):
+    v = np.asarray(vecs, dtype=np.float64)
+    length = np.linalg.norm(v, axis=-1)
+    return np.where(length > 0, np.arccos(np.clip(v[..., 2]/np.where(length > 0, length, 1), -1, 1)), 0.0)
+
+# batch version of a.angle(b, 0.0)
+def angle_between(a, b):
+    return np.arccos(np.clip(np.sum(normalized(a)*normalized(b), axis=-1), -1, 1))*(np.any(a, axis=-1) & np.any(b, axis=-1))
+
+# batch version of bl_math.clamp
+def clamp(x, lo=0.0, hi=1.0):
+    return np.where(x < lo, lo, np.minimum(x, hi))
 
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
@@ -42,7 +201,7 @@ if __name__ == "__main__":
         grid = []
         ran = 5
         lim *= 0.1
-        spine = [Vector((0.0, 0.0, 0.0)), Vector((-0.04053265228867531, 0.1525326669216156, 0.5666670203208923)), Vector((-0.05233679339289665, 0.2162090241909027, 1.1513268947601318)), Vector((0.08932508528232574, 0.07073953002691269, 1.7034058570861816)), Vector((0.3351735472679138, -0.1757250726222992, 2.1775729656219482)), Vector((0.603615939617157, -0.4416947364807129, 2.628371238708496)), Vector((0.9189794659614563, -0.7344887852668762, 3.0294179916381836)), Vector((1.2864696979522705, -1.0440350770950317, 3.3687584400177)), Vector((1.5507733821868896, -1.3234150409698486, 3.813856601715088)), Vector((1.4413506984710693, -1.4571164846420288, 4.376147747039795)), Vector((1.1136771440505981, -1.5123927593231201, 4.861530303955078)), Vector((0.7895124554634094, -1.5705634355545044, 5.3489251136779785)), Vector((0.40334513783454895, -1.6063776016235352, 5.791208267211914)), Vector((-0.05430370569229126, -1.612501621246338, 6.160719394683838)), Vector((-0.49577754735946655, -1.616670846939087, 6.549442768096924)), Vector((-0.767345666885376, -1.5683027505874634, 7.068993091583252)), Vector((-0.6747534275054932, -1.3740949630737305, 7.616468906402588)), Vector((-0.3822815418243408, -1.097188115119934, 8.04518985748291))]
+        spine = np.array([(0.0, 0.0, 0.0), (-0.04053265228867531, 0.1525326669216156, 0.5666670203208923), (-0.05233679339289665, 0.2162090241909027, 1.1513268947601318), (0.08932508528232574, 0.07073953002691269, 1.7034058570861816), (0.3351735472679138, -0.1757250726222992, 2.1775729656219482), (0.603615939617157, -0.4416947364807129, 2.628371238708496), (0.9189794659614563, -0.7344887852668762, 3.0294179916381836), (1.2864696979522705, -1.0440350770950317, 3.3687584400177), (1.5507733821868896, -1.3234150409698486, 3.813856601715088), (1.4413506984710693, -1.4571164846420288, 4.376147747039795), (1.1136771440505981, -1.5123927593231201, 4.861530303955078), (0.7895124554634094, -1.5705634355545044, 5.3489251136779785), (0.40334513783454895, -1.6063776016235352, 5.791208267211914), (-0.05430370569229126, -1.612501621246338, 6.160719394683838), (-0.49577754735946655, -1.616670846939087, 6.549442768096924), (-0.767345666885376, -1.5683027505874634, 7.068993091583252), (-0.6747534275054932, -1.3740949630737305, 7.616468906402588), (-0.3822815418243408, -1.097188115119934, 8.04518985748291)])
         #grid = poisson()
         #print(test(grid, radius))
         print(len(grid))
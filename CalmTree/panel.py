@@ -1,4 +1,5 @@
 import bpy
+import json
 
 class CALMTREE_PT_createparent:
     bl_space_type = "VIEW_3D"  
@@ -28,6 +29,8 @@ class CALMTREE_PT_createmain(CALMTREE_PT_createparent, bpy.types.Panel):
         tps = bpy.data.window_managers["WinMan"].calmtree_props
 
         col.operator('object.tree_create', text = 'Create',icon='SCRIPT')
+        col.operator('object.tree_update_modal', text = 'Update in background', icon='SORTTIME')
+        col.operator('object.tree_update_worker', text = 'Update in worker process', icon='FORCE_HARMONIC')
         col.operator('object.tree_sync', text = 'Sync', icon='FILE_REFRESH')
         col.operator('object.tree_default', text = 'Reset to default', icon='LOOP_BACK')
         col.separator()
@@ -114,6 +117,8 @@ class CALMTREE_PT_createadvanced(CALMTREE_PT_createparent, bpy.types.Panel):
         tps = bpy.data.window_managers["WinMan"].calmtree_props
 
         col = layout.column(align=True)
+        col.prop(wm, "calmtree_update_delay")
+        col.prop(wm, "calmtree_preview")
         col.prop(wm.calmtree_props, "interp")
         col.prop(wm.calmtree_props, "branch_horizontal")
         col.label(text="Branch generation")
@@ -121,6 +126,31 @@ class CALMTREE_PT_createadvanced(CALMTREE_PT_createparent, bpy.types.Panel):
         if tps.poisson_type=='fancy':
             col.prop(wm.calmtree_props, "poisson_qual")
 
+class CALMTREE_PT_createstats(CALMTREE_PT_createparent, bpy.types.Panel):
+    """Shows where the time of the last generation went"""
+    bl_label = "Timings"
+    bl_parent_id = "CALMTREE_PT_createmain"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self,context):
+        layout = self.layout
+        col = layout.column(align=True)
+        col.operator('object.tree_profile', text='Profile next update', icon='PREVIEW_RANGE',
+                     depress=context.window_manager.calmtree_profile)
+        if context.object is None or "CalmTreeStats" not in context.object:
+            col.label(text="Create or update a tree first")
+            return
+        stats = json.loads(context.object["CalmTreeStats"])
+        stages = stats['stages']
+        hot = max(stages, key=stages.get)
+        col.label(text="Total %.1f ms" % (sum(stages.values())*1000))
+        for stage, seconds in stages.items():
+            col.label(text="%s: %.1f ms" % (stage, seconds*1000), icon='TIME' if stage == hot else 'BLANK1')
+        col.separator()
+        col.label(text="Level: branches, verts, faces")
+        for lev, (branches, verts, faces) in enumerate(stats['levels']):
+            col.label(text="%d: %d, %d, %d" % (lev, branches, verts, faces))
+
 class CALMTREE_PT_materialsparent:
     bl_space_type = "VIEW_3D"  
     bl_region_type = "UI"
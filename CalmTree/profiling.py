@@ -0,0 +1,54 @@
+'''
+cProfile capture of one call, saved as a pstats file and as collapsed stacks for flamegraph tools
+(flamegraph.pl, speedscope, inferno), no Blender needed
+'''
+import cProfile
+import os
+import pstats
+
+# short name of a profiled function, builtins have no file
+def funcname(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return '%s:%d(%s)' % (os.path.basename(filename), line, name)
+
+# cProfile only keeps caller -> callee edges, so the stacks are rebuilt from the roots down
+# and the time of a function is split between the paths leading to it by the time of each edge
+def collapsed(stats, mintime=1e-6):
+    callees = {}
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    lines = {}
+
+    def walk(func, stack, share):
+        cc, nc, tt, ct, callers = stats.stats[func]
+        fraction = share/ct if ct else 0.0
+        stack = stack+(funcname(func),)
+        if tt*fraction >= mintime:
+            key = ';'.join(stack)
+            lines[key] = lines.get(key, 0.0)+tt*fraction
+        for callee, edge_time in callees.get(func, []):
+            if funcname(callee) not in stack and edge_time*fraction >= mintime: #recursion is cut at the first repeat
+                walk(callee, stack, edge_time*fraction)
+
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if not callers:
+            walk(func, (), ct)
+    return ['%s %d' % (stack, round(seconds*1e6)) for stack, seconds in lines.items()] #sample counts in microseconds
+
+# functions with the most time spent in themselves, as (self seconds, cumulative seconds, calls, name)
+def topfunctions(stats, n=10):
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:n]
+    return [(tt, ct, nc, funcname(func)) for func, (cc, nc, tt, ct, callers) in rows]
+
+# runs fn under cProfile, writes base.pstats and base.collapsed.txt and returns fn's result and the stats
+def profilecall(fn, base):
+    profile = cProfile.Profile()
+    result = profile.runcall(fn)
+    stats = pstats.Stats(profile)
+    stats.dump_stats(base+'.pstats')
+    with open(base+'.collapsed.txt', 'w') as f:
+        f.write('\n'.join(collapsed(stats))+'\n')
+    return result, stats
@@ -1,10 +1,11 @@
 import bpy
 from math import pi
+from .scheduler import request_update
 
 def tree_update(self, context):
     tps = bpy.data.window_managers['WinMan'].calmtree_props
     if tps.ops_complete: 
-        bpy.ops.object.tree_update()
+        request_update(context)
 def leaf_update(self,context):
     tps = bpy.data.window_managers['WinMan'].calmtree_props
     if tps.leafbool:
@@ -0,0 +1,102 @@
+import time
+import bpy
+
+
+class debouncer():
+    # collapses a burst of requests into one call, made once no new request came for the delay
+    # a newer request replaces the pending one, so only the latest target is ever run
+    def __init__(self, run):
+        self.run = run
+        self.due = None
+        self.target = None
+        self.callback = self.tick  # bound once, the timers tell callbacks apart by identity
+
+    def request(self, target, delay):
+        self.target = target
+        self.due = time.monotonic()+delay
+        if not bpy.app.timers.is_registered(self.callback):
+            bpy.app.timers.register(self.callback, first_interval=delay)
+
+    def cancel(self):
+        self.due = None
+        if bpy.app.timers.is_registered(self.callback):
+            bpy.app.timers.unregister(self.callback)
+
+    def pending(self):
+        return self.due is not None
+
+    def tick(self):
+        if self.due is None:
+            return None
+        remaining = self.due-time.monotonic()
+        if remaining > 0:
+            return remaining  # superseded while waiting, wait for the latest request instead
+        self.due = None
+        self.run(self.target)
+        return None
+
+
+def treeop(obj, **options):
+    # the update operator run on obj, whichever object is active
+    window = bpy.context.window_manager.windows[0]
+    with bpy.context.temp_override(window=window, object=obj, active_object=obj):
+        if options:
+            bpy.ops.object.tree_update('EXEC_DEFAULT', False, **options)  # no undo step for previews
+        else:
+            bpy.ops.object.tree_update()
+
+
+def run_update(name, preview=False):
+    # updates the tree the properties were changed on, dropped if it is gone or no longer active,
+    # a tree showing a preview always gets its full quality pass so the mesh matches the stored settings
+    obj = bpy.data.objects.get(name)
+    if obj is None or (bpy.context.view_layer.objects.active != obj and name not in previews['shown']):
+        previews['shown'].discard(name)
+        return
+    if preview:
+        treeop(obj, preview=True)
+        previews['shown'].add(name)
+    else:
+        treeop(obj)
+        settle(name)
+
+
+def settle(name):
+    # previews left on other trees, when the pending update moved on to another one, are taken back
+    previews['shown'].discard(name)
+    for other in previews['shown']:
+        obj = bpy.data.objects.get(other)
+        if obj is not None:
+            treeop(obj, restore=True)
+    previews['shown'].clear()
+
+
+updates = debouncer(run_update)
+previews = {'end': 0.0, 'took': 0.0, 'shown': set()}
+
+
+def run_preview(name):
+    # previews never take more than half of the time while dragging, slower ones get skipped
+    start = time.monotonic()
+    if start-previews['end'] < previews['took']:
+        return
+    run_update(name, preview=True)
+    previews['end'] = time.monotonic()
+    previews['took'] = previews['end']-start
+
+
+def request_update(context):
+    # property changes only update the tree after the panel was left alone for calmtree_update_delay,
+    # changes coming in while one is still pending mean a slider is dragged and get a quick preview
+    wm = context.window_manager
+    delay = wm.calmtree_update_delay
+    if delay <= 0 or context.object is None:
+        updates.cancel()
+        bpy.ops.object.tree_update()
+        if context.object is not None:
+            settle(context.object.name)
+    else:
+        dragging = updates.pending()
+        updates.request(context.object.name, delay)
+        if dragging and wm.calmtree_preview:
+            run_preview(context.object.name)
@@ -2,6 +2,7 @@ import bpy
 import bmesh
 import mathutils
 from math import acos
+from .algorithm import unpacklog
 
 class CALMTREE_OT_uv(bpy.types.Operator):
     """creates convienient uvmap for the tree"""
@@ -15,7 +16,13 @@ class CALMTREE_OT_uv(bpy.types.Operator):
             mat_rot = mathutils.Matrix.Rotation(alpha, 2)
             return mat_rot@pt
                         
-        info = [list(l) for l in context.object["CalmTreeLog"]]
+        # bark ranges of the branches, from the stored skeleton of trees that have one
+        skeleton = context.object.get("CalmTreeSkeleton")
+        if skeleton is not None:
+            info = [[start, end, sides] for start, end, sides in zip(
+                skeleton["vstart"], skeleton["vend"], skeleton["sides"]) if start >= 0]
+        else:
+            info = unpacklog(context.object["CalmTreeLog"]).tolist()
         cam = context.scene.camera
         if not cam: 
             self.report({"INFO"}, "This won't work without camera in the scene")
@@ -0,0 +1,93 @@
+'''
+tree generation in a separate process, so Blender's UI thread stays free while it runs
+
+The worker writes the mesh buffers and the skeleton arrays into multiprocessing.shared_memory
+blocks and only sends their names, shapes and dtypes back through a pipe, the arrays themselves
+are never pickled. The caller polls the job and maps the blocks as numpy arrays to copy them
+into the mesh.
+'''
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+BUFFERS = ('verts', 'edges', 'faces', 'selection', 'info')
+
+# copies an array into a new shared block, the block is left for the caller to unlink
+def share(data):
+    block = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+    np.ndarray(data.shape, data.dtype, buffer=block.buf)[...] = data
+    block.close()
+    return block.name, data.shape, data.dtype.str
+
+# runs in the worker, sends the layout of the shared mesh buffers and skeleton arrays
+def treeworker(settings, curve, conn):
+    from .algorithm import treecache, treeparams
+    try:
+        cache = treecache()
+        buffers = cache.generate(treeparams(**settings), curve)
+        layout = [share(np.ascontiguousarray(data, dtype=np.float32 if name == 'verts' else np.int32))
+                  for name, data in zip(BUFFERS, buffers)]
+        skeleton = {name: share(value) if isinstance(value, np.ndarray) else value
+                    for name, value in cache.skeleton().items()}
+        conn.send(('done', (layout, skeleton)))
+    except Exception as error:
+        conn.send(('error', repr(error)))
+    finally:
+        conn.close()
+
+
+class treejob():
+    # one generation in a spawned process, fork is not safe in a program with a UI and threads
+    def __init__(self, settings, curve=None):
+        context = mp.get_context('spawn')
+        self.conn, child = context.Pipe(duplex=False)
+        self.process = context.Process(target=treeworker, args=(settings, curve, child), daemon=True)
+        self.process.start()
+        child.close()
+        self.blocks = []
+        self.collected = False
+
+    # None while running, otherwise the mesh buffers and the skeleton as numpy views of the shared blocks
+    # they stay valid until release(), raises RuntimeError if the worker failed
+    def poll(self):
+        if not self.conn.poll():
+            if not self.process.is_alive():
+                raise RuntimeError('tree worker exited with code %s' % self.process.exitcode)
+            return None
+        try:
+            status, result = self.conn.recv()
+        except EOFError:
+            status, result = 'error', 'tree worker exited with code %s' % self.process.exitcode
+        self.collected = True
+        self.process.join()
+        if status == 'error':
+            raise RuntimeError(result)
+        layout, skeleton = result
+        buffers = tuple(self.attach(*shared) for shared in layout)
+        skeleton = {name: self.attach(*value) if isinstance(value, tuple) else value for name, value in skeleton.items()}
+        return buffers, skeleton
+
+    def attach(self, name, shape, dtype):
+        block = shared_memory.SharedMemory(name=name)
+        self.blocks.append(block)
+        return np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+
+    # stops a running worker and frees the shared blocks, the arrays from poll() are invalid afterwards
+    def release(self):
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        elif not self.collected and self.conn.poll():
+            try:
+                status, result = self.conn.recv()  # finished but never collected
+            except EOFError:
+                status = 'error'
+            if status == 'done':
+                layout, skeleton = result
+                for shared in layout+[value for value in skeleton.values() if isinstance(value, tuple)]:
+                    self.attach(*shared)
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+        self.conn.close()
@@ -0,0 +1,26 @@
+import json
+import os
+import numpy as np
+from CalmTree import batch
+
+
+def runbatch(tmp_path, props, *args):
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    params = tmp_path/'params.json'
+    params.write_text(json.dumps(props))
+    out = tmp_path/'trees'
+    assert batch.main([str(params), '--out', str(out), '--workers', '1', *args]) == 0
+    return out
+
+
+def test_params_with_a_vary_setting(tmp_path):
+    out = runbatch(tmp_path, {'branch_levels': 1, 'branch_seed': 5}, '--seeds', '1-2')
+    assert sorted(os.listdir(out)) == ['stats.csv', 'tree_00001.npz', 'tree_00001.obj', 'tree_00002.npz', 'tree_00002.obj']
+
+
+def test_skeleton_takes_the_scale(tmp_path):
+    small = np.load(runbatch(tmp_path/'small', {'branch_levels': 1}) / 'tree_00001.npz')
+    large = np.load(runbatch(tmp_path/'large', {'branch_levels': 1, 'Mscale': 2.0}) / 'tree_00001.npz')
+    for name in ('points', 'length', 'radius', 'tipradius', 'segment'):
+        assert np.allclose(large[name], small[name]*2), name
+    assert np.array_equal(large['start'], small['start'])
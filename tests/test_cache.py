@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from CalmTree.algorithm import STAGES, generate, treecache, treeparams
+
+# one edit to every stage in turn, with the number of levels raised and lowered in between
+EDITS = [
+    ('Mscale', 1.5), ('Msides', 8), ('interp', 1), ('branch_number3', 1.5), ('branch_levels', 3),
+    ('branch_number2', 0.8), ('branch_levels', 1), ('branch_levels', 2), ('branch_seed', 4),
+    ('Mtipradius', 0.01), ('facebool', False), ('bends_seed', 3), ('facebool', True), ('branch_levels', 3),
+]
+
+
+def trunkcurve(bend):
+    t = np.linspace(0, 1, 12)
+    return np.stack((bend*np.sin(3*t), np.zeros_like(t), 6*t), axis=-1)
+
+
+def same(cached, fresh):
+    return all(np.array_equal(np.asarray(a), np.asarray(b)) for a, b in zip(cached, fresh))
+
+
+def test_edits_cover_every_stage():
+    assert {STAGES[name] for name, value in EDITS} == set(STAGES.values())
+
+
+@pytest.mark.parametrize('curve', [None, trunkcurve(0.3)])
+def test_cached_equals_fresh(curve):
+    cache = treecache()
+    props = {'poisson_type': 'fast', 'branch_levels': 1}
+    assert same(cache.generate(treeparams(**props), curve), generate(treeparams(**props), curve))
+    for name, value in EDITS:
+        props[name] = value
+        assert same(cache.generate(treeparams(**props), curve), generate(treeparams(**props), curve)), name
+
+
+def test_changed_curve_grows_again():
+    cache = treecache()
+    tps = treeparams(poisson_type='fast')
+    cache.generate(tps, trunkcurve(0.3))
+    for curve in (trunkcurve(0.6), None, trunkcurve(0.3)):
+        assert same(cache.generate(tps, curve), generate(tps, curve))
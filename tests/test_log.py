@@ -0,0 +1,13 @@
+import numpy as np
+from CalmTree.algorithm import generate, packlog, treeparams, unpacklog
+
+
+def test_legacy_and_packed_logs_give_the_same_rows():
+    info = generate(treeparams(poisson_type='fast'))[4]
+    legacy = [[int(start), int(end), int(sides)] for start, end, sides in info]
+    packed = packlog(info)
+    assert packed.dtype == np.int32 and packed.ndim == 1
+    rows = unpacklog(legacy)
+    assert rows.dtype == np.int32 and rows.shape == (len(info), 3)
+    assert np.array_equal(rows, unpacklog(packed))
+    assert np.array_equal(rows, info)
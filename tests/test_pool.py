@@ -0,0 +1,24 @@
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pytest
+from CalmTree.algorithm import generate, treeparams
+
+
+@pytest.fixture(scope='module', params=['Pool', 'ProcessPoolExecutor'])
+def pool(request):
+    context = mp.get_context('spawn')
+    if request.param == 'Pool':
+        with context.Pool(2) as pool:
+            yield pool
+    else:
+        with ProcessPoolExecutor(2, mp_context=context) as pool:
+            yield pool
+
+
+@pytest.mark.parametrize('poisson_type', ['fancy', 'fast'])
+def test_pooled_equals_serial(pool, poisson_type):
+    tps = treeparams(poisson_type=poisson_type, branch_levels=3)
+    serial, pooled = generate(tps), generate(tps, pool=pool)
+    for a, b in zip(serial, pooled):
+        assert np.array_equal(np.asarray(a), np.asarray(b))
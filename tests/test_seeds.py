@@ -0,0 +1,28 @@
+import copy
+import numpy as np
+from CalmTree.algorithm import growtree, guides, sprout, treeparams
+
+
+def test_branches_depend_only_on_their_path():
+    tps = treeparams(poisson_type='fast', branch_levels=3)
+    branchlist, (m_p, br_p, bn_p, bd_p, r_p, t_p, e_p) = growtree(tps)
+    lev = 1
+    parents, level = branchlist[lev], branchlist[lev+1]
+    lev_brp = br_p[:3]+[br_p[3]**(2**lev)]+br_p[4:]
+
+    # the guides of every parent placed from the last parent to the first
+    jobs = [parents.guidesjob(i, bn_p[lev], lev_brp, t_p, e_p[1], e_p[2]) for i in range(len(parents))]
+    packs = [guides(job) for job in reversed(jobs)][::-1]
+    regrown = sprout(parents, packs, bd_p, r_p)
+    assert np.array_equal(regrown.paths, level.paths)
+    assert np.array_equal(regrown.start, level.start)
+    assert np.array_equal(regrown.spine, level.spine)
+
+    # the whole level grown again with its branches in reverse order
+    origin, guide = (np.concatenate([pack[k] for pack in packs]).reshape(-1, 3)[::-1] for k in range(2))
+    reverse = copy.copy(level)
+    for name in ('parent', 'child', 'paths', 'sides', 'length', 'radius', 'tipradius', 'segment'):
+        setattr(reverse, name, getattr(level, name)[::-1].copy())
+    reverse.grow(origin, guide, bd_p, r_p, False)
+    for i in range(len(level)):
+        assert np.array_equal(reverse.points(len(level)-1-i), level.points(i)), level.path(i)